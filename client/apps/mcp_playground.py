@@ -1,38 +1,69 @@
 import datetime
+import functools
+import io
+import itertools
+import json
+import re
+import types
+from xml.sax.saxutils import escape as xml_escape
 import streamlit as st
-import base64
 import uuid
 import time
 from langchain_core.messages import HumanMessage, ToolMessage
 from services.ai_service import get_response_stream
-from services.mcp_service import run_agent
-from services.chat_service import get_current_chat, _append_message_to_session
+from services.mcp_service import run_agent, get_tool_names_joined
+from services.chat_service import get_current_messages, _append_message_to_session, _extend_messages_to_session
 from services.export_service import export_chat_to_markdown, export_chat_to_json
 from services.logging_service import get_logger
 from services.task_monitor import get_task_monitor
 from utils.async_helpers import run_async
+from utils.json_helpers import json_loads
 from utils.ai_prompts import make_system_prompt, make_main_prompt
 import ui_components.sidebar_components as sd_compents
 from  ui_components.main_components import display_tool_executions
-from config import DEFAULT_MAX_TOKENS, DEFAULT_TEMPERATURE
+from config import DEFAULT_MAX_TOKENS, DEFAULT_TEMPERATURE, SMOOTH_STREAMING
 import traceback
 
 
-def replace_citation(match, citation_to_doc, doc_id_to_info):
-    """Replace citation markers with formatted citations"""
-    citation_num = int(match.group(1))
-    if citation_num in citation_to_doc:
-        doc_id = citation_to_doc[citation_num]
-        if doc_id in doc_id_to_info:
-            doc_info = doc_id_to_info[doc_id]
-            title = doc_info.get('title', 'N/A')
-            return f"([{citation_num}]({doc_info.get('url', '#')} \"{title}\"))"
-    return match.group(0)
+# Markers that introduce the final Bio QA answer / literature review report in
+# tool output. The probes are the ASCII parts, which survive JSON escaping and
+# let raw SSE lines be filtered before they are decoded.
+_BIO_FINAL_ANSWER_MARKER = "Bio-QA-final-Answer："
+_BIO_FINAL_ANSWER_PROBE = "Bio-QA-final-Answer"
+_REVIEW_FINAL_REPORT_MARKER = "Final_report\n"
+_REVIEW_FINAL_REPORT_PROBE = "Final_report"
+
+# Heading text that marks an assistant message as a literature review report
+_REVIEW_SENTINEL = "Literature Review Report"
+
+# Citation markers emitted by the Bio QA service
+_ALL_CITES_RE = re.compile(
+    r'\[bio-rag-citation:(?P<cite>\d+)\]'
+    r'|\[\^(?P<foot>\d+)\]'
+    r'|\[document (?P<doc>\d+)\]'
+)
+# Literal prefixes of the markers above, for a cheap "any citations?" check
+_CITATION_TOKENS = ('[bio-rag-citation:', '[^', '[document ')
+
+# Tool output longer than this is shown as plain text rather than highlighted code
+_TOOL_CODE_MAX_CHARS = 16_384
+
+# Minimum seconds between redraws of a streaming reply (one 60 Hz frame)
+_STREAM_FLUSH_INTERVAL = 0.016
+
+# Fenced JSON blocks embedded in non-SSE bio_qa_stream_chat output
+_RE_FENCED_BLOCK = re.compile(r'```(bio-chat-agent-task|bio-resource-lookup)\n(.*?)\n```', re.DOTALL)
 
 
-def replace_footnote_citation(match, citation_to_doc, doc_id_to_info):
-    """Replace footnote citation markers with formatted citations"""
-    citation_num = int(match.group(1))
+def _iter_docs(*search_data_lists):
+    """Yield every bioDocs entry from one or more lists of search results, in order"""
+    for search_data in itertools.chain.from_iterable(search_data_lists):
+        yield from search_data.get('handlerParam', {}).get('bioDocs', [])
+
+
+def _replace_citation(match, citation_to_doc, doc_id_to_info):
+    """Replace a citation marker (any supported style) with a formatted citation"""
+    citation_num = match.group(match.lastindex)
     if citation_num in citation_to_doc:
         doc_id = citation_to_doc[citation_num]
         if doc_id in doc_id_to_info:
@@ -42,18 +73,143 @@ def replace_footnote_citation(match, citation_to_doc, doc_id_to_info):
     return match.group(0)
 
 
-def replace_document_citation(match, citation_to_doc, doc_id_to_info):
-    """Replace document citation markers with formatted citations"""
-    citation_num = int(match.group(1))
-    if citation_num in citation_to_doc:
-        doc_id = citation_to_doc[citation_num]
-        if doc_id in doc_id_to_info:
-            doc_info = doc_id_to_info[doc_id]
+@functools.lru_cache(maxsize=4096)
+def _display_author(author: str) -> str:
+    """Shorten an author list to its first three names followed by 'et al.'"""
+    authors = author.split(', ')
+    if len(authors) > 3:
+        return ', '.join(authors[:3]) + ' et al.'
+    return author
+
+
+def _count_docs(search_data_list: list) -> int:
+    """Count the bioDocs across a list of search results"""
+    total = 0
+    for search_data in search_data_list:
+        try:
+            total += len(search_data['handlerParam']['bioDocs'])
+        except KeyError:
+            pass
+    return total
+
+
+def _analysis_header(bio_search_data: list, web_search_data: list) -> str:
+    """Return the 'Analysis based on ...' heading for a Bio QA answer, or '' when nothing was searched"""
+    if not (bio_search_data or web_search_data):
+        return ""
+    total_bio_docs = _count_docs(bio_search_data)
+    total_web_docs = _count_docs(web_search_data)
+    if total_bio_docs > 0 and total_web_docs > 0:
+        return f"### 📚 Analysis based on {total_bio_docs} scientific papers and {total_web_docs} web pages"
+    elif total_bio_docs > 0:
+        return f"### 📚 Analysis based on {total_bio_docs} scientific papers"
+    return f"### 🌐 Analysis based on {total_web_docs} web pages"
+
+
+@st.cache_data(show_spinner=False)
+def _render_bio_message(content_text: str, bio_search_data: list, bio_citation_data: list,
+                        web_search_data: list) -> tuple[str, str]:
+    """
+    Build the markdown for a stored Bio QA final answer.
+
+    History messages never change once saved, so the citation rewrite and
+    reference list are cached and replayed on every Streamlit rerun.
+
+    Returns:
+        (processed_answer, references_md); references_md is empty when there
+        are no citations.
+    """
+    # Without citation data there is nothing to rewrite or list
+    if not bio_citation_data:
+        return content_text, ""
+
+    # Create docId to literature info mapping (PubMed first, then web search)
+    doc_id_to_info = {doc.get('docId'): doc for doc in _iter_docs(bio_search_data, web_search_data)}
+
+    # Process citation markers in final answer
+    processed_answer = content_text
+    if bio_search_data or web_search_data:
+        # Answers that cite nothing skip the mapping and the regex scan
+        if any(token in processed_answer for token in _CITATION_TOKENS):
+            # Create citation number to docId mapping, keyed by the digits the regex captures
+            citation_to_doc = {str(c['citation']): c['docId'] for c in bio_citation_data
+                               if 'citation' in c and 'docId' in c}
+
+            # Replace all citation marker styles in a single pass
+            replace_citation_local = functools.partial(
+                _replace_citation, citation_to_doc=citation_to_doc, doc_id_to_info=doc_id_to_info
+            )
+            processed_answer = _ALL_CITES_RE.sub(replace_citation_local, processed_answer)
+
+        # Remove bottom references section (since we display complete reference list below)
+        refs_idx = processed_answer.find('\n\nReferences:')
+        if refs_idx != -1:
+            processed_answer = processed_answer[:refs_idx]
+
+        # Then process consecutive citations, add separators
+        processed_answer = processed_answer.replace('][', '], [')
+
+    # Build citation information
+    references = [f"### 📖 References ({len(bio_citation_data)} citations)"]
+
+    # Citation list
+    for citation in bio_citation_data:
+        doc_id = citation.get('docId')
+        citation_num = citation.get('citation')
+
+        doc_info = doc_id_to_info.get(doc_id)
+        if doc_info is not None:
             title = doc_info.get('title', 'N/A')
-            return f"([{citation_num}]({doc_info.get('url', '#')} \"{title}\"))"
-    return match.group(0)
+            url = doc_info.get('url', '#')
+
+            if citation.get('source', '') == 'webSearch':
+                references.append(f"[{citation_num}] {title}. [Link]({url})")
+            else:
+                author = doc_info.get('author', 'N/A')
+                journal = doc_info.get('JournalInfo', 'N/A')
+
+                display_author = _display_author(author)
+
+                references.append(f"[{citation_num}] {display_author}. {title}. {journal}. [Link]({url})")
+        else:
+            references.append(f"[{citation_num}] Document ID: {doc_id}")
+
+    return processed_answer, "\n\n".join(references)
+
+
+def _iter_lines(raw: str):
+    """Yield the lines of *raw* one at a time using str.find, without building a list"""
+    pos = 0
+    length = len(raw)
+    while pos < length:
+        nl = raw.find('\n', pos)
+        end = length if nl == -1 else nl
+        yield raw[pos:end]
+        pos = end + 1
+
 
+def _looks_like_json(text: str) -> bool:
+    """Cheap check for a JSON object/array payload before paying for a decode attempt"""
+    head = text[:1]
+    if head.isspace():
+        head = text.lstrip()[:1]
+    return head in ('{', '[')
 
+
+def iter_sse_events(buf: str):
+    """Yield the decoded JSON payload of every 'data: ' line in *buf*, skipping malformed events"""
+    loads = json_loads
+    for line in _iter_lines(buf):
+        if not line.startswith('data: '):
+            continue
+        try:
+            data = loads(line[6:])  # Remove 'data: ' prefix
+        except json.JSONDecodeError:
+            continue
+        yield data
+
+
+@st.cache_data(show_spinner=False, max_entries=256)
 def extract_bio_final_answer(raw: str) -> str | None:
     """
     Extract the final answer from bio_qa_stream_chat ToolMessage text marked with
@@ -66,19 +222,38 @@ def extract_bio_final_answer(raw: str) -> str | None:
     if not raw:
         return None
 
-    marker = "Bio-QA-final-Answer："
+    marker = _BIO_FINAL_ANSWER_MARKER
 
     # --- Scenario A: SSE line stream (contains 'data:')
     if "data:" in raw:
+        # Fast path: the final answer is normally the last marker line, so decode only that
+        # line, provided no done event precedes it (the full scan stops at done)
+        idx = raw.rfind(_BIO_FINAL_ANSWER_PROBE)
+        if idx != -1:
+            start = raw.rfind('\n', 0, idx) + 1
+            end = raw.find('\n', idx)
+            line = raw[start:end if end != -1 else len(raw)].strip()
+            if line.startswith("data: ") and raw.find('"done"', 0, start) == -1:
+                try:
+                    data = json_loads(line[6:])
+                except Exception:
+                    data = None
+                if isinstance(data, dict) and data.get("type") == "result":
+                    content = str(data.get("content", ""))
+                    if content.startswith(marker):
+                        return content[len(marker):].strip()
+
         final = []
-        for line in raw.splitlines():
+        for line in _iter_lines(raw):
+            # Only marker and done events matter, skip JSON decoding for everything else
+            if _BIO_FINAL_ANSWER_PROBE not in line and "done" not in line:
+                continue
             line = line.strip()
             if not line.startswith("data: "):
                 continue
             # Parse JSON
             try:
-                import json
-                data = json.loads(line[6:])
+                data = json_loads(line[6:])
             except Exception:
                 continue
             if data.get("type") == "result":
@@ -109,6 +284,7 @@ def extract_bio_final_answer(raw: str) -> str | None:
     return None
 
 
+@st.cache_data(show_spinner=False, max_entries=256)
 def extract_review_final_report(raw: str) -> str | None:
     """
     Extract the final report content from review_generate ToolMessage text marked with
@@ -121,20 +297,23 @@ def extract_review_final_report(raw: str) -> str | None:
     if not raw:
         return None
 
-    marker = "Final_report\n"
+    marker = _REVIEW_FINAL_REPORT_MARKER
 
     # --- Scenario A: SSE line stream (contains 'data:')
     if "data:" in raw:
-        final_content = []
+        final_content = bytearray()
+        has_content = False
         found_marker = False
-        for line in raw.splitlines():
+        for line in _iter_lines(raw):
+            # Until the marker is seen, only marker and done events need decoding
+            if not found_marker and _REVIEW_FINAL_REPORT_PROBE not in line and "done" not in line:
+                continue
             line = line.strip()
             if not line.startswith("data: "):
                 continue
             # Parse JSON
             try:
-                import json
-                data = json.loads(line[6:])
+                data = json_loads(line[6:])
             except Exception:
                 continue
             if data.get("type") == "result":
@@ -144,12 +323,13 @@ def extract_review_final_report(raw: str) -> str | None:
                     continue
                 elif found_marker:
                     # Collect all content after marker
-                    final_content.append(content)
+                    final_content += content.encode("utf-8", "surrogatepass")
+                    has_content = True
             elif data.get("type") == "done":
                 # End flag, exit directly
                 break
-        if final_content:
-            return "".join(final_content).strip()
+        if has_content:
+            return final_content.decode("utf-8", "surrogatepass").strip()
 
     # --- Scenario B: Plain text (does not contain 'data:'), directly find marker
     idx = raw.find(marker)
@@ -166,6 +346,155 @@ def extract_review_final_report(raw: str) -> str | None:
     return None
 
 
+# PDF export dependencies, imported on the first PDF download only
+_pdf_deps = None
+
+
+def _get_pdf_deps() -> types.SimpleNamespace:
+    """Import reportlab and the markdown parser once and reuse them for later PDF exports"""
+    global _pdf_deps
+    if _pdf_deps is None:
+        from reportlab.lib.pagesizes import A4
+        from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
+        from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+        from reportlab.lib.enums import TA_JUSTIFY, TA_LEFT
+        from markdown_it import MarkdownIt
+
+        _pdf_deps = types.SimpleNamespace(
+            A4=A4,
+            SimpleDocTemplate=SimpleDocTemplate,
+            Paragraph=Paragraph,
+            Spacer=Spacer,
+            getSampleStyleSheet=getSampleStyleSheet,
+            ParagraphStyle=ParagraphStyle,
+            TA_JUSTIFY=TA_JUSTIFY,
+            TA_LEFT=TA_LEFT,
+            md_parser=MarkdownIt('commonmark').enable('table'),
+        )
+    return _pdf_deps
+
+
+@functools.lru_cache(maxsize=1)
+def _get_pdf_styles() -> types.SimpleNamespace:
+    """Build the PDF paragraph styles once; they are read-only after creation"""
+    pdf = _get_pdf_deps()
+    ParagraphStyle = pdf.ParagraphStyle
+    styles = pdf.getSampleStyleSheet()
+
+    body_style = ParagraphStyle(
+        'CustomBody',
+        parent=styles['Normal'],
+        fontSize=11,
+        spaceAfter=6,
+        alignment=pdf.TA_JUSTIFY
+    )
+
+    return types.SimpleNamespace(
+        title=ParagraphStyle(
+            'CustomTitle',
+            parent=styles['Heading1'],
+            fontSize=16,
+            spaceAfter=30,
+            alignment=pdf.TA_LEFT
+        ),
+        heading=ParagraphStyle(
+            'CustomHeading',
+            parent=styles['Heading2'],
+            fontSize=14,
+            spaceAfter=12,
+            spaceBefore=20,
+            alignment=pdf.TA_LEFT
+        ),
+        body=body_style,
+        code=ParagraphStyle(
+            'CodeText',
+            parent=body_style,
+            fontName='Courier',
+            fontSize=10,
+            backColor='#f8f9fa'
+        ),
+        pre=ParagraphStyle(
+            'PreText',
+            parent=body_style,
+            fontName='Courier',
+            fontSize=10,
+            backColor='#f8f9fa',
+            leftIndent=20
+        ),
+        quote=ParagraphStyle(
+            'QuoteText',
+            parent=body_style,
+            leftIndent=20,
+            leftPadding=10,
+            borderWidth=1,
+            borderColor='#3498db',
+            borderPadding=5
+        ),
+    )
+
+
+def _pdf_inline_text(inline) -> str:
+    """Flatten a markdown-it inline token into reportlab paragraph markup, keeping links"""
+    parts = []
+    for child in inline.children or ():
+        if child.type in ('text', 'code_inline', 'image'):
+            parts.append(xml_escape(child.content))
+        elif child.type == 'link_open':
+            href = xml_escape(child.attrGet('href') or '#', {'"': '&quot;'})
+            parts.append(f'<link href="{href}">')
+        elif child.type == 'link_close':
+            parts.append('</link>')
+        elif child.type in ('softbreak', 'hardbreak'):
+            parts.append(' ')
+    return ''.join(parts).strip()
+
+
+def _iter_pdf_flowables(tokens, title: str, pdf: types.SimpleNamespace, styles: types.SimpleNamespace):
+    """Yield reportlab flowables for a title plus markdown-it block tokens, in a single pass"""
+    Paragraph, Spacer = pdf.Paragraph, pdf.Spacer
+
+    yield Paragraph(title, styles.title)
+    yield Spacer(1, 12)
+
+    list_stack = []  # next ordinal per open list, None for bullet lists
+    bullet = ''
+    quote_depth = 0
+    for i, token in enumerate(tokens):
+        if token.type == 'heading_open':
+            yield Paragraph(_pdf_inline_text(tokens[i + 1]), styles.heading)
+            yield Spacer(1, 6)
+        elif token.type == 'paragraph_open':
+            text = _pdf_inline_text(tokens[i + 1])
+            if list_stack:
+                yield Paragraph(f'{bullet}{text}', styles.body)
+                bullet = ''
+            elif quote_depth:
+                yield Paragraph(text, styles.quote)
+            elif text:
+                yield Paragraph(text, styles.body)
+        elif token.type in ('fence', 'code_block'):
+            yield Paragraph(xml_escape(token.content.rstrip('\n')), styles.pre)
+            yield Spacer(1, 6)
+        elif token.type == 'bullet_list_open':
+            list_stack.append(None)
+        elif token.type == 'ordered_list_open':
+            list_stack.append(int(token.attrGet('start') or 1))
+        elif token.type == 'list_item_open':
+            if list_stack[-1] is None:
+                bullet = '• '
+            else:
+                bullet = f'{list_stack[-1]}. '
+                list_stack[-1] += 1
+        elif token.type in ('bullet_list_close', 'ordered_list_close'):
+            list_stack.pop()
+            yield Spacer(1, 6)
+        elif token.type == 'blockquote_open':
+            quote_depth += 1
+        elif token.type == 'blockquote_close':
+            quote_depth -= 1
+            yield Spacer(1, 6)
+
+
 def create_download_button(content: str, filename: str, file_type: str = "md", tool_type: str = "literature_review"):
     """
     Create a download button that supports downloading as Markdown or PDF format
@@ -182,8 +511,7 @@ def create_download_button(content: str, filename: str, file_type: str = "md", t
     base_key = f"download_{tool_type}_{file_type}_{counter}"
 
     # Add timestamp to filename
-    from datetime import datetime
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
     
     # Generate appropriate filename based on tool type
     if tool_type == "bio_qa_stream_chat":
@@ -208,52 +536,17 @@ def create_download_button(content: str, filename: str, file_type: str = "md", t
     elif file_type == "pdf":
         try:
             # Use reportlab with markdown parsing (no system dependencies)
-            from reportlab.lib.pagesizes import letter, A4
-            from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, PageBreak
-            from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-            from reportlab.lib.units import inch
-            from reportlab.lib.enums import TA_JUSTIFY, TA_LEFT
-            from io import BytesIO
-            import markdown
+            pdf = _get_pdf_deps()
             
-            # Convert markdown to HTML first for better parsing
-            html_content = markdown.markdown(content, extensions=['tables', 'fenced_code'])
+            # Tokenize markdown directly, no HTML round trip
+            tokens = pdf.md_parser.parse(content)
             
             # Create PDF document
-            buffer = BytesIO()
-            doc = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=72, leftMargin=72, topMargin=72, bottomMargin=18)
+            buffer = io.BytesIO()
+            doc = pdf.SimpleDocTemplate(buffer, pagesize=pdf.A4, rightMargin=72, leftMargin=72, topMargin=72, bottomMargin=18)
             
             # Get styles
-            styles = getSampleStyleSheet()
-            
-            # Create custom styles
-            title_style = ParagraphStyle(
-                'CustomTitle',
-                parent=styles['Heading1'],
-                fontSize=16,
-                spaceAfter=30,
-                alignment=TA_LEFT
-            )
-            
-            heading_style = ParagraphStyle(
-                'CustomHeading',
-                parent=styles['Heading2'],
-                fontSize=14,
-                spaceAfter=12,
-                spaceBefore=20,
-                alignment=TA_LEFT
-            )
-            
-            body_style = ParagraphStyle(
-                'CustomBody',
-                parent=styles['Normal'],
-                fontSize=11,
-                spaceAfter=6,
-                alignment=TA_JUSTIFY
-            )
-            
-            # Build PDF content
-            story = []
+            styles = _get_pdf_styles()
             
             # Add title based on tool type
             if tool_type == "bio_qa_stream_chat":
@@ -263,81 +556,8 @@ def create_download_button(content: str, filename: str, file_type: str = "md", t
             else:
                 title = "Report"
             
-            story.append(Paragraph(title, title_style))
-            story.append(Spacer(1, 12))
-            
-            # Parse HTML content and convert to PDF elements
-            from bs4 import BeautifulSoup, NavigableString
-            
-            soup = BeautifulSoup(html_content, 'html.parser')
-            
-            def element_text_with_links(element) -> str:
-                parts = []
-                for child in element.children:
-                    if isinstance(child, NavigableString):
-                        parts.append(str(child))
-                    elif getattr(child, 'name', None) == 'a':
-                        href = child.get('href', '#')
-                        text = child.get_text(strip=True)
-                        parts.append(f'<link href="{href}">{text}</link>')
-                    else:
-                        # Fallback to text for other inline elements
-                        parts.append(child.get_text(strip=False))
-                return ''.join(parts).strip()
-            
-            for element in soup.find_all(['h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'p', 'code', 'pre', 'blockquote', 'ul', 'ol', 'li']):
-                if element.name in ['h1', 'h2', 'h3']:
-                    heading_text = element_text_with_links(element)
-                    story.append(Paragraph(heading_text or element.get_text(), heading_style))
-                    story.append(Spacer(1, 6))
-                elif element.name == 'p':
-                    text = element_text_with_links(element)
-                    if text.strip():
-                        story.append(Paragraph(text, body_style))
-                elif element.name == 'code':
-                    code_style = ParagraphStyle(
-                        'CodeText',
-                        parent=body_style,
-                        fontName='Courier',
-                        fontSize=10,
-                        backColor='#f8f9fa'
-                    )
-                    story.append(Paragraph(element.get_text(), code_style))
-                elif element.name == 'pre':
-                    pre_style = ParagraphStyle(
-                        'PreText',
-                        parent=body_style,
-                        fontName='Courier',
-                        fontSize=10,
-                        backColor='#f8f9fa',
-                        leftIndent=20
-                    )
-                    story.append(Paragraph(element.get_text(), pre_style))
-                    story.append(Spacer(1, 6))
-                elif element.name == 'blockquote':
-                    quote_style = ParagraphStyle(
-                        'QuoteText',
-                        parent=body_style,
-                        leftIndent=20,
-                        leftPadding=10,
-                        borderWidth=1,
-                        borderColor='#3498db',
-                        borderPadding=5
-                    )
-                    quote_text = element_text_with_links(element)
-                    story.append(Paragraph(quote_text or element.get_text(), quote_style))
-                    story.append(Spacer(1, 6))
-                elif element.name in ['ul', 'ol']:
-                    index = 0
-                    for li in element.find_all('li', recursive=False):
-                        index += 1
-                        li_text = element_text_with_links(li)
-                        bullet = '• ' if element.name == 'ul' else f'{index}. '
-                        story.append(Paragraph(f'{bullet}{li_text}', body_style))
-                    story.append(Spacer(1, 6))
-            
-            # Generate PDF
-            doc.build(story)
+            # Generate PDF (reportlab consumes the story as a list)
+            doc.build(list(_iter_pdf_flowables(tokens, title, pdf, styles)))
             pdf_bytes = buffer.getvalue()
             buffer.close()
             
@@ -352,11 +572,201 @@ def create_download_button(content: str, filename: str, file_type: str = "md", t
             )
             
         except ImportError as e:
-            st.warning(f"⚠️ Cannot generate PDF: Missing required libraries. Please install reportlab and beautifulsoup4. Error: {str(e)}")
+            st.warning(f"⚠️ Cannot generate PDF: Missing required libraries. Please install reportlab and markdown-it-py. Error: {str(e)}")
         except Exception as e:
             st.error(f"❌ Error generating PDF: {str(e)}")
 
 
+def _chunk_text(chunk) -> str:
+    """Text carried by one streamed LLM chunk (plain str, message chunk or content blocks)"""
+    content = getattr(chunk, "content", chunk)
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return "".join(
+            block if isinstance(block, str) else block.get("text", "")
+            for block in content
+            if isinstance(block, (str, dict))
+        )
+    return ""
+
+
+def _stream_markdown(stream) -> str:
+    """
+    Render a token stream into a single placeholder, redrawing at most once per
+    frame plus a final flush, and return the full text.
+
+    With SMOOTH_STREAMING the partial reply is drawn with st.code, which skips
+    the markdown parse on every redraw; the final flush is always markdown.
+    """
+    placeholder = st.empty()
+    parts = []
+    last_flush = 0.0
+    for chunk in stream:
+        text = _chunk_text(chunk)
+        if not text:
+            continue
+        parts.append(text)
+        now = time.monotonic()
+        if now - last_flush >= _STREAM_FLUSH_INTERVAL:
+            if SMOOTH_STREAMING:
+                placeholder.code("".join(parts), language="markdown")
+            else:
+                placeholder.markdown("".join(parts))
+            last_flush = now
+    response = "".join(parts)
+    placeholder.markdown(response)
+    return response
+
+
+def _render_tool_expander(label: str, content: str):
+    """Show raw tool output in a collapsed expander; large or JSON payloads skip YAML highlighting"""
+    with st.expander(label, expanded=False):
+        if len(content) > _TOOL_CODE_MAX_CHARS or _looks_like_json(content):
+            st.text(content)
+        else:
+            st.code(content, language='yaml')
+
+
+@st.fragment
+def _render_download_options(content: str, filename: str, tool_type: str):
+    """
+    Render the Markdown/PDF download buttons for a final answer or report.
+
+    Runs as a fragment, so clicking a button reruns only this block instead
+    of the whole chat page.
+    """
+    st.markdown("---")
+    st.markdown("### 📥 Download Options")
+    col1, col2 = st.columns(2)
+    with col1:
+        create_download_button(content, filename, "md", tool_type)
+    with col2:
+        create_download_button(content, filename, "pdf", tool_type)
+
+
+def _render_bio_final_answer(answer: str, bio_search_data: list, bio_citation_data: list,
+                             web_search_data: list) -> str:
+    """
+    Render a fresh Bio QA final answer with its analysis heading and references.
+
+    Returns:
+        The complete markdown that is saved to history and offered for download.
+    """
+    # Citation rewrite and reference list are shared with the history renderer
+    processed_answer, references_md = _render_bio_message(
+        answer, bio_search_data, bio_citation_data, web_search_data
+    )
+    analysis_header = _analysis_header(bio_search_data, web_search_data)
+
+    # Display found literature information
+    if analysis_header:
+        st.markdown(analysis_header)
+    st.markdown("### 🎯 Final Answer")
+    st.markdown(processed_answer)
+    # Display citation information (moved below final answer)
+    if references_md:
+        st.markdown(references_md)
+
+    # Build complete content for download (including references)
+    content_parts = []
+    if analysis_header:
+        content_parts.append(analysis_header + "\n\n")
+    content_parts.append("### 🎯 Final Answer\n\n")
+    content_parts.append(processed_answer)
+    content_parts.append("\n\n")
+    if references_md:
+        content_parts.append(references_md + "\n\n")
+    return "".join(content_parts)
+
+
+def _render_review_success(tool_label: str, tool_content: str, report: str, messages_container):
+    """
+    Show a literature review final report and save it to the current chat.
+
+    Shared by the SSE and plain review_generate branches.
+    """
+    # Always display ToolMessage (collapsible)
+    _render_tool_expander(tool_label, tool_content)
+
+    # Display final report in main conversation area
+    with messages_container.chat_message("assistant"):
+        st.markdown("---")
+        st.markdown("### 📚 Literature Review Report")
+        st.markdown(report)
+
+        # Add download buttons to main conversation area (persistent)
+        _render_download_options(report, "literature_review", "review_generate")
+
+    # Save final report to session history, plus the original ToolMessage for reference
+    _extend_messages_to_session([
+        {'role': 'assistant', 'content': report, 'is_review_report': True},
+        {'role': 'assistant', 'content': '', 'tool': tool_content},
+    ])
+
+
+@st.fragment
+def _render_history_message(m: dict, tool_count: int, bio_data: dict):
+    """
+    Render one chat-history message inside the current chat bubble.
+
+    Runs as a fragment so interacting with its download buttons reruns only
+    this message instead of the whole history.
+    """
+    role = m.get("role")
+    tool_val = m.get("tool")
+    content_val = m.get("content")
+
+    # 先显示ToolMessage（如果有）
+    if tool_val:
+        # Display ToolMessage in collapsible format
+        _render_tool_expander(f"🔧 ToolMessage - {tool_count}", tool_val)
+
+    # 再显示content（如果有）
+    if content_val:
+        content_text = str(content_val)
+
+        # Check if this is a bio final answer and restore citations
+        is_bio_answer = (role == "assistant" and
+                         bio_data.get('has_bio_final_answer') and
+                         bio_data.get('bio_final_answer_content') == content_text)
+        if is_bio_answer:
+
+            # Restore bio data for citation processing
+            bio_search_data = bio_data.get('bio_search_data', [])
+            bio_citation_data = bio_data.get('bio_citation_data', [])
+            web_search_data = bio_data.get('web_search_data', [])
+
+            # Display found literature information
+            analysis_header = _analysis_header(bio_search_data, web_search_data)
+            if analysis_header:
+                st.markdown(analysis_header)
+
+            st.markdown("### 🎯 Final Answer")
+
+            processed_answer, references_md = _render_bio_message(
+                content_text, bio_search_data, bio_citation_data, web_search_data
+            )
+            st.markdown(processed_answer)
+            if references_md:
+                st.markdown(references_md)
+        else:
+            # Normal content display
+            st.markdown(content_text)
+
+        # Check if this is a report worth downloading and add download buttons
+        if role == "assistant":
+            if m.get("is_bio_report") or m.get("is_review_report") or _REVIEW_SENTINEL in content_text:
+                # Add download buttons for review reports
+                st.markdown("---")
+                st.markdown("### 📥 Download Options")
+                col1, col2 = st.columns(2)
+                with col1:
+                    create_download_button(content_text, "literature_review", "md", "bio_qa_stream_chat")
+                with col2:
+                    create_download_button(content_text, "literature_review", "pdf", "bio_qa_stream_chat")
+
+
 def main():
     # Initialize logger
     logger = get_logger()
@@ -375,167 +785,25 @@ def main():
 # ------------------------------------------------------------------ Chat history
      # Re-render previous messages
     if st.session_state.get('current_chat_id'):
-        st.session_state["messages"] = get_current_chat(st.session_state['current_chat_id'])
+        get_current_messages(st.session_state['current_chat_id'])
         tool_count = 0
-        
-        # Debug: log message count
-        logger.log_system_status(f"Re-rendering {len(st.session_state['messages'])} messages for chat {st.session_state['current_chat_id']}")
-        
+
         # Load bio data for this chat if available
         chat_id = st.session_state['current_chat_id']
         bio_data_key = f"bio_data_{chat_id}"
         bio_data = st.session_state.get(bio_data_key, {})
         
         for m in st.session_state["messages"]:
-            # Debug: log message structure
-            has_tool = "tool" in m and m["tool"]
-            has_content = "content" in m and m["content"]
-            logger.log_system_status(f"Message: role={m.get('role')}, has_tool={has_tool}, has_content={has_content}")
-            
-            with messages_container.chat_message(m["role"]):
-                # 先显示ToolMessage（如果有）
-                if "tool" in m and m["tool"]:
-                    tool_count += 1
-                    # Display ToolMessage in collapsible format
-                    with st.expander(f"🔧 ToolMessage - {tool_count}", expanded=False):
-                        st.code(m["tool"], language='yaml')
-                
-                # 再显示content（如果有）
-                if "content" in m and m["content"]:
-                    content_text = str(m["content"])
-                    
-                    # Check if this is a bio final answer and restore citations
-                    if (m["role"] == "assistant" and 
-                        bio_data.get('has_bio_final_answer') and 
-                        bio_data.get('bio_final_answer_content') == content_text):
-                        
-                        # Restore bio data for citation processing
-                        bio_search_data = bio_data.get('bio_search_data', [])
-                        bio_citation_data = bio_data.get('bio_citation_data', [])
-                        web_search_data = bio_data.get('web_search_data', [])
-                        
-                        # Display found literature information
-                        if bio_search_data or web_search_data:
-                            total_bio_docs = sum(len(data.get('handlerParam', {}).get('bioDocs', [])) for data in bio_search_data)
-                            total_web_docs = sum(len(data.get('handlerParam', {}).get('bioDocs', [])) for data in web_search_data)
-                            if total_bio_docs > 0 and total_web_docs > 0:
-                                st.markdown(f"### 📚 Analysis based on {total_bio_docs} scientific papers and {total_web_docs} web pages")
-                            elif total_bio_docs > 0:
-                                st.markdown(f"### 📚 Analysis based on {total_bio_docs} scientific papers")
-                            else:
-                                st.markdown(f"### 🌐 Analysis based on {total_web_docs} web pages")
-                        
-                        st.markdown("### 🎯 Final Answer")
-                        
-                        # Process citation markers in final answer
-                        processed_answer = content_text
-                        if bio_citation_data and (bio_search_data or web_search_data):
-                            # Create docId to literature info mapping
-                            doc_id_to_info = {}
-                            # Add PubMed data
-                            for search_data in bio_search_data:
-                                bio_docs = search_data.get('handlerParam', {}).get('bioDocs', [])
-                                for doc in bio_docs:
-                                    doc_id_to_info[doc.get('docId')] = doc
-                            # Add web search data
-                            for search_data in web_search_data:
-                                web_docs = search_data.get('handlerParam', {}).get('bioDocs', [])
-                                for doc in web_docs:
-                                    doc_id_to_info[doc.get('docId')] = doc
-                            
-                            # Create citation number to docId mapping
-                            citation_to_doc = {}
-                            for citation in bio_citation_data:
-                                citation_num = citation.get('citation')
-                                doc_id = citation.get('docId')
-                                citation_to_doc[citation_num] = doc_id
-                            
-                            # Replace citation markers
-                            import re
-                            
-                            # First replace single citations
-                            def replace_citation_local(match):
-                                return replace_citation(match, citation_to_doc, doc_id_to_info)
-                            processed_answer = re.sub(r'\[bio-rag-citation:(\d+)\]', replace_citation_local, processed_answer)
-                            
-                            def replace_footnote_citation_local(match):
-                                return replace_footnote_citation(match, citation_to_doc, doc_id_to_info)
-                            processed_answer = re.sub(r'\[\^(\d+)\]', replace_footnote_citation_local, processed_answer)
-                            
-                            def replace_document_citation_local(match):
-                                return replace_document_citation(match, citation_to_doc, doc_id_to_info)
-                            processed_answer = re.sub(r'\[document (\d+)\]', replace_document_citation_local, processed_answer)
-                            
-                            # Remove bottom references section (since we display complete reference list below)
-                            processed_answer = re.sub(r'\n\nReferences:.*$', '', processed_answer, flags=re.DOTALL)
-                            
-                            # Then process consecutive citations, add separators
-                            processed_answer = re.sub(r'\](\[)', r'], \1', processed_answer)
-                        
-                        st.markdown(processed_answer)
-                        
-                        # Display citation information
-                        if bio_citation_data:
-                            st.markdown(f"### 📖 References ({len(bio_citation_data)} citations)")
-                            
-                            # Create docId to literature info mapping
-                            doc_id_to_info = {}
-                            # Add PubMed data
-                            for search_data in bio_search_data:
-                                bio_docs = search_data.get('handlerParam', {}).get('bioDocs', [])
-                                for doc in bio_docs:
-                                    doc_id_to_info[doc.get('docId')] = doc
-                            # Add web search data
-                            for search_data in web_search_data:
-                                web_docs = search_data.get('handlerParam', {}).get('bioDocs', [])
-                                for doc in web_docs:
-                                    doc_id_to_info[doc.get('docId')] = doc
-                            
-                            # Display citation list
-                            for citation in bio_citation_data:
-                                doc_id = citation.get('docId')
-                                citation_num = citation.get('citation')
-                                source = citation.get('source', '')
-                                
-                                if doc_id in doc_id_to_info:
-                                    doc_info = doc_id_to_info[doc_id]
-                                    title = doc_info.get('title', 'N/A')
-                                    url = doc_info.get('url', '#')
-                                    
-                                    if source == 'webSearch':
-                                        st.markdown(f"[{citation_num}] {title}. [Link]({url})")
-                                    else:
-                                        author = doc_info.get('author', 'N/A')
-                                        journal = doc_info.get('JournalInfo', 'N/A')
-                                        
-                                        authors = author.split(', ')
-                                        if len(authors) > 3:
-                                            display_author = ', '.join(authors[:3]) + ' et al.'
-                                        else:
-                                            display_author = author
-                                        
-                                        st.markdown(f"[{citation_num}] {display_author}. {title}. {journal}. [Link]({url})")
-                                else:
-                                    st.markdown(f"[{citation_num}] Document ID: {doc_id}")
-                    else:
-                        # Normal content display
-                        st.markdown(content_text)
-                    
-                    # Check if this is a review report and add download buttons
-                    if m["role"] == "assistant" and m["content"]:
-                        # Try to detect if this is a literature review report
-                        content_text = str(m["content"])
-                        if ("Literature Review Report" in content_text or 
-                            "📚 Literature Review Report" in content_text or
-                            len(content_text) > 500):  # Assume long content might be a review report
-                            # Add download buttons for review reports
-                            st.markdown("---")
-                            st.markdown("### 📥 Download Options")
-                            col1, col2 = st.columns(2)
-                            with col1:
-                                create_download_button(content_text, "literature_review", "md", "bio_qa_stream_chat")
-                            with col2:
-                                create_download_button(content_text, "literature_review", "pdf", "bio_qa_stream_chat")
+            role = m.get('role')
+            if m.get('tool'):
+                tool_count += 1
+            with messages_container.chat_message(role):
+                _render_history_message(m, tool_count, bio_data)
+
+        # Debug: one summary line per rerun rather than one per message
+        logger.log_system_status(
+            f"Re-rendered chat {chat_id}: {len(st.session_state['messages'])} messages, {tool_count} tools"
+        )
 
 # ------------------------------------------------------------------ Chat input
     user_text = st.chat_input("Ask a question or explore available MCP tools")
@@ -594,25 +862,25 @@ def main():
                 if st.session_state.agent:
                     logger.log_system_status("Using MCP agent for response")
                     
-                    # 记录可用的MCP工具
-                    available_tools = [tool.name for tool in st.session_state.tools]
-                    logger.log_mcp_agent_usage("ReactAgent", available_tools, st.session_state.get('current_chat_id'))
+                    # 记录可用的MCP工具（工具名拼接结果按工具列表缓存）
+                    logger.log_mcp_agent_usage("ReactAgent", chat_id=st.session_state.get('current_chat_id'),
+                                               tools_joined=get_tool_names_joined())
                     
                     response = run_async(run_agent(st.session_state.agent, user_text))
                     tool_output = None
                     tools_used_in_response = []
+                    tool_executions = []
                     
                     # Extract tool executions if available
                     if "messages" in response:
-                        logger.log_system_status(f"Processing {len(response['messages'])} messages from agent response")
+                        # Message kinds are collected and logged once after the loop
+                        message_kinds = []
                         for msg in response["messages"]:
-                            # Debug: log message type
                             msg_type = type(msg).__name__
-                            logger.log_system_status(f"Processing message type: {msg_type}")
                             
                             # Look for AIMessage with tool calls
                             if hasattr(msg, 'tool_calls') and msg.tool_calls:
-                                logger.log_system_status(f"Found tool calls: {msg.tool_calls}")
+                                message_kinds.append(f"{msg_type}[{', '.join(tc['name'] for tc in msg.tool_calls)}]")
                                 for tool_call in msg.tool_calls:
                                     tools_used_in_response.append(tool_call['name'])
                                     
@@ -638,16 +906,20 @@ def main():
                                             st.session_state.get('current_chat_id')
                                         )
                                         
-                                        st.session_state.tool_executions.append({
+                                        tool_executions.append({
                                             "tool_name": tool_call['name'],
                                             "input": tool_call['args'],
                                             "output": tool_output,
-                                            "timestamp": datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                                            "timestamp": time.time()
                                         })
                             elif hasattr(msg, 'name') and msg.name:
-                                logger.log_system_status(f"Found ToolMessage: {msg.name}")
+                                message_kinds.append(f"{msg_type}({msg.name})")
                             else:
-                                logger.log_system_status(f"Message has no tool calls or name: {msg}")
+                                message_kinds.append(msg_type)
+                        st.session_state.tool_executions.extend(tool_executions)
+                        logger.log_system_status(
+                            f"Processed {len(message_kinds)} messages from agent response: {', '.join(message_kinds)}"
+                        )
                     
                     # 记录实际使用的工具
                     if tools_used_in_response:
@@ -688,6 +960,7 @@ def main():
                                 continue  # Skip human messages
                             elif hasattr(msg, 'name') and msg.name:  # ToolMessage
                                 tool_count += 1
+                                tool_label = f"🔧 ToolMessage - {tool_count} ({msg.name})"
                                 with messages_container.chat_message("assistant"):
                                     # Parse SSE stream data if it's a streaming tool response
                                     if (msg.name == "bio_qa_stream_chat" or msg.name == "review_generate" or msg.name == "health_check") and "data:" in msg.content:
@@ -699,519 +972,122 @@ def main():
                                             st.write("**🏥 Health Check Results:**")
                                         
                                         # Parse and display streaming content
-                                        lines = msg.content.split('\n')
                                         handled_final_answer = False
                                         handled_final_report = False
                                         final_report_content = []
-                                        for line in lines:
-                                            if line.startswith('data: '):
-                                                try:
-                                                    import json
-                                                    data = json.loads(line[6:])  # Remove 'data: ' prefix
-                                                    if data.get('type') == 'result':
-                                                        content = data.get('content', '')
-                                                        # Check if this is a final answer
-                                                        if content.startswith("Bio-QA-final-Answer：") and not handled_final_answer:
-                                                            # Extract final answer content
-                                                            bio_final_answer_content = content.replace("Bio-QA-final-Answer：", "").strip()
-                                                            # Save to session state
-                                                            bio_data['bio_final_answer_content'] = bio_final_answer_content
-                                                            bio_data['has_bio_final_answer'] = True
-                                                            st.session_state[bio_data_key] = bio_data
-                                                            
-                                                            # Set as main output
-                                                            output = bio_final_answer_content
-                                                            # Set flag to skip LLM processing
-                                                            has_bio_final_answer = True
-                                                            # Display final answer immediately in main conversation area
-                                                            st.markdown("---")
-                                                            # Display found literature information
-                                                            if bio_search_data or web_search_data:
-                                                                total_bio_docs = sum(len(data.get('handlerParam', {}).get('bioDocs', [])) for data in bio_search_data)
-                                                                total_web_docs = sum(len(data.get('handlerParam', {}).get('bioDocs', [])) for data in web_search_data)
-                                                                # total_docs = total_bio_docs + total_web_docs
-                                                                if total_bio_docs > 0 and total_web_docs > 0:
-                                                                    st.markdown(f"### 📚 Analysis based on {total_bio_docs} scientific papers and {total_web_docs} web pages")
-                                                                elif total_bio_docs > 0:
-                                                                    st.markdown(f"### 📚 Analysis based on {total_bio_docs} scientific papers")
-                                                                else:
-                                                                    st.markdown(f"### 🌐 Analysis based on {total_web_docs} web pages")
-                                                            
-
-                                                            
-                                                            st.markdown("### 🎯 Final Answer")
-                                                            
-                                                            # Process citation markers in final answer
-                                                            processed_answer = bio_final_answer_content
-                                                            if bio_citation_data and (bio_search_data or web_search_data):
-                                                                # Create docId to literature info mapping
-                                                                doc_id_to_info = {}
-                                                                # Add PubMed data
-                                                                for search_data in bio_search_data:
-                                                                    bio_docs = search_data.get('handlerParam', {}).get('bioDocs', [])
-                                                                    for doc in bio_docs:
-                                                                        doc_id_to_info[doc.get('docId')] = doc
-                                                                # Add web search data
-                                                                for search_data in web_search_data:
-                                                                    web_docs = search_data.get('handlerParam', {}).get('bioDocs', [])
-                                                                    for doc in web_docs:
-                                                                        doc_id_to_info[doc.get('docId')] = doc
-                                                                
-                                                                # Create citation number to docId mapping
-                                                                citation_to_doc = {}
-                                                                for citation in bio_citation_data:
-                                                                    citation_num = citation.get('citation')
-                                                                    doc_id = citation.get('docId')
-                                                                    citation_to_doc[citation_num] = doc_id
-                                                                
-                                                                # Replace citation markers
-                                                                import re
-                                                                # First replace single citations
-                                                                processed_answer = re.sub(r'\[bio-rag-citation:(\d+)\]', replace_citation, processed_answer)
-                                                                
-                                                                processed_answer = re.sub(r'\[\^(\d+)\]', replace_footnote_citation, processed_answer)
-                                                                
-                                                                processed_answer = re.sub(r'\[document (\d+)\]', replace_document_citation, processed_answer)
-                                                                
-                                                                # Remove bottom references section (since we display complete reference list below)
-                                                                processed_answer = re.sub(r'\n\nReferences:.*$', '', processed_answer, flags=re.DOTALL)
-                                                                
-                                                                # Then process consecutive citations, add separators
-                                                                processed_answer = re.sub(r'\](\[)', r'], \1', processed_answer)
-                                                            
-                                                            st.markdown(processed_answer)
-                                                            
-                                                            # Display citation information (moved below final answer)
-                                                            if bio_citation_data:
-                                                                st.markdown(f"### 📖 References ({len(bio_citation_data)} citations)")
-                                                                
-                                                                # Create docId to literature info mapping
-                                                                doc_id_to_info = {}
-                                                                # Add PubMed data
-                                                                for search_data in bio_search_data:
-                                                                    bio_docs = search_data.get('handlerParam', {}).get('bioDocs', [])
-                                                                    for doc in bio_docs:
-                                                                        doc_id_to_info[doc.get('docId')] = doc
-                                                                # Add web search data
-                                                                for search_data in web_search_data:
-                                                                    web_docs = search_data.get('handlerParam', {}).get('bioDocs', [])
-                                                                    for doc in web_docs:
-                                                                        doc_id_to_info[doc.get('docId')] = doc
-                                                                
-                                                                # Display citation list, associate with literature info (standard reference format)
-                                                                for citation in bio_citation_data:
-                                                                    doc_id = citation.get('docId')
-                                                                    citation_num = citation.get('citation')
-                                                                    source = citation.get('source', '')
-                                                                    
-                                                                    if doc_id in doc_id_to_info:
-                                                                        doc_info = doc_id_to_info[doc_id]
-                                                                        title = doc_info.get('title', 'N/A')
-                                                                        url = doc_info.get('url', '#')
-                                                                        
-                                                                        if source == 'webSearch':
-                                                                            # Web citation format: [number] title. [link](URL)
-                                                                            st.markdown(f"[{citation_num}] {title}. [Link]({url})")
-                                                                        else:
-                                                                            # PubMed literature citation format: [number] author. title. journal info. [link](URL)
-                                                                            author = doc_info.get('author', 'N/A')
-                                                                            journal = doc_info.get('JournalInfo', 'N/A')
-                                                                            
-                                                                            # Process author info, only show first 3
-                                                                            authors = author.split(', ')
-                                                                            if len(authors) > 3:
-                                                                                display_author = ', '.join(authors[:3]) + ' et al.'
-                                                                            else:
-                                                                                display_author = author
-                                                                            
-                                                                            st.markdown(f"[{citation_num}] {display_author}. {title}. {journal}. [Link]({url})")
-                                                                    else:
-                                                                        st.markdown(f"[{citation_num}] Document ID: {doc_id}")
-                                                            
-                                                            # Build complete content for download (including references)
-                                                            complete_content = ""
-                                                            
-                                                            # Add analysis information
-                                                            if bio_search_data or web_search_data:
-                                                                total_bio_docs = sum(len(data.get('handlerParam', {}).get('bioDocs', [])) for data in bio_search_data)
-                                                                total_web_docs = sum(len(data.get('handlerParam', {}).get('bioDocs', [])) for data in web_search_data)
-                                                                if total_bio_docs > 0 and total_web_docs > 0:
-                                                                    complete_content += f"### 📚 Analysis based on {total_bio_docs} scientific papers and {total_web_docs} web pages\n\n"
-                                                                elif total_bio_docs > 0:
-                                                                    complete_content += f"### 📚 Analysis based on {total_bio_docs} scientific papers\n\n"
-                                                                else:
-                                                                    complete_content += f"### 🌐 Analysis based on {total_web_docs} web pages\n\n"
-                                                            
-                                                            # Add final answer
-                                                            complete_content += "### 🎯 Final Answer\n\n"
-                                                            complete_content += processed_answer + "\n\n"
-                                                            
-                                                            # Add references
-                                                            if bio_citation_data:
-                                                                complete_content += f"### 📖 References ({len(bio_citation_data)} citations)\n\n"
-                                                                
-                                                                # Create docId to literature info mapping
-                                                                doc_id_to_info = {}
-                                                                # Add PubMed data
-                                                                for search_data in bio_search_data:
-                                                                    bio_docs = search_data.get('handlerParam', {}).get('bioDocs', [])
-                                                                    for doc in bio_docs:
-                                                                        doc_id_to_info[doc.get('docId')] = doc
-                                                                # Add web search data
-                                                                for search_data in web_search_data:
-                                                                    web_docs = search_data.get('handlerParam', {}).get('bioDocs', [])
-                                                                    for doc in web_docs:
-                                                                        doc_id_to_info[doc.get('docId')] = doc
-                                                                
-                                                                # Add citation list to complete content
-                                                                for citation in bio_citation_data:
-                                                                    doc_id = citation.get('docId')
-                                                                    citation_num = citation.get('citation')
-                                                                    source = citation.get('source', '')
-                                                                    
-                                                                    if doc_id in doc_id_to_info:
-                                                                        doc_info = doc_id_to_info[doc_id]
-                                                                        title = doc_info.get('title', 'N/A')
-                                                                        url = doc_info.get('url', '#')
-                                                                        
-                                                                        if source == 'webSearch':
-                                                                            complete_content += f"[{citation_num}] {title}. [Link]({url})\n\n"
-                                                                        else:
-                                                                            author = doc_info.get('author', 'N/A')
-                                                                            journal = doc_info.get('JournalInfo', 'N/A')
-                                                                            
-                                                                            authors = author.split(', ')
-                                                                            if len(authors) > 3:
-                                                                                display_author = ', '.join(authors[:3]) + ' et al.'
-                                                                            else:
-                                                                                display_author = author
-                                                                            
-                                                                            complete_content += f"[{citation_num}] {display_author}. {title}. {journal}. [Link]({url})\n\n"
-                                                                    else:
-                                                                        complete_content += f"[{citation_num}] Document ID: {doc_id}\n\n"
-                                                            
-                                                            # Add download buttons for Bio QA final answer (with complete content)
-                                                            st.markdown("---")
-                                                            st.markdown("### 📥 Download Options")
-                                                            col1, col2 = st.columns(2)
-                                                            with col1:
-                                                                create_download_button(complete_content, "bio_qa_report", "md", "bio_qa_stream_chat")
-                                                            with col2:
-                                                                create_download_button(complete_content, "bio_qa_report", "pdf", "bio_qa_stream_chat")
-                                                            
-                                                            # Save complete content to session history
-                                                            _append_message_to_session({'role': 'assistant', 'content': complete_content})
-                                                            
-                                                            # Force immediate rerender so Download Options appear without needing a new interaction
-                                                            st.rerun()
-
-                                                            handled_final_answer = True
-                                                        # Check if this is a final report marker
-                                                        elif content == "Final_report\n" and not handled_final_report:
-                                                            handled_final_report = True
-                                                            # Start collecting final report content
-                                                            continue
-                                                        elif handled_final_report:
-                                                            # Collect final report content
-                                                            final_report_content.append(content)
-                                                        else:
-                                                            # Try to parse JSON data and store
-                                                            try:
-                                                                import json
-                                                                json_data = json.loads(content)
-                                                                if json_data.get("type") == "search" and json_data.get("handler") == "QASearch":
-                                                                    handler_param = json_data.get('handlerParam', {})
-                                                                    source = handler_param.get('source', '')
-                                                                    if source == 'pubmed':
-                                                                        bio_search_data.append(json_data)
-                                                                        # Save to session state
-                                                                        bio_data['bio_search_data'] = bio_search_data
-                                                                        st.session_state[bio_data_key] = bio_data
-                                                                        st.write(f"🔍 Found {len(handler_param.get('bioDocs', []))} relevant papers")
-                                                                    elif source == 'webSearch':
-                                                                        web_search_data.append(json_data)
-                                                                        # Save to session state
-                                                                        bio_data['web_search_data'] = web_search_data
-                                                                        st.session_state[bio_data_key] = bio_data
-                                                                        st.write(f"🌐 Found {len(handler_param.get('bioDocs', []))} relevant web pages")
-                                                                elif isinstance(json_data, list) and len(json_data) > 0 and "source" in json_data[0] and "citation" in json_data[0]:
-                                                                    # This is citation data
-                                                                    bio_citation_data.extend(json_data)
-                                                                    # Save to session state
-                                                                    bio_data['bio_citation_data'] = bio_citation_data
-                                                                    st.session_state[bio_data_key] = bio_data
-                                                                    st.write(f"📝 Generated citation information, {len(json_data)} citations total")
-                                                                else:
-                                                                    st.write(content)
-                                                            except json.JSONDecodeError:
-                                                                # If not JSON, display content normally
-                                                                st.write(content)
-                                                    elif data.get('type') == 'done':
-                                                        st.success("✅ Answer completed")
-                                                except json.JSONDecodeError:
+                                        for data in iter_sse_events(msg.content):
+                                            if data.get('type') == 'result':
+                                                content = data.get('content', '')
+                                                # Check if this is a final answer
+                                                if content.startswith(_BIO_FINAL_ANSWER_MARKER) and not handled_final_answer:
+                                                    # Extract final answer content
+                                                    bio_final_answer_content = content.replace(_BIO_FINAL_ANSWER_MARKER, "").strip()
+                                                    # Save to session state
+                                                    bio_data['bio_final_answer_content'] = bio_final_answer_content
+                                                    bio_data['has_bio_final_answer'] = True
+                                                    
+                                                    # Set as main output
+                                                    output = bio_final_answer_content
+                                                    # Set flag to skip LLM processing
+                                                    has_bio_final_answer = True
+                                                    # Display final answer immediately in main conversation area
+                                                    st.markdown("---")
+                                                    complete_content = _render_bio_final_answer(
+                                                        bio_final_answer_content, bio_search_data, bio_citation_data, web_search_data
+                                                    )
+
+                                                    # Add download buttons for Bio QA final answer (with complete content)
+                                                    _render_download_options(complete_content, "bio_qa_report", "bio_qa_stream_chat")
+                                                    
+                                                    # Save complete content to session history
+                                                    _append_message_to_session({'role': 'assistant', 'content': complete_content, 'is_bio_report': True})
+                                                    handled_final_answer = True
+                                                # Check if this is a final report marker
+                                                elif content == _REVIEW_FINAL_REPORT_MARKER and not handled_final_report:
+                                                    handled_final_report = True
+                                                    # Start collecting final report content
                                                     continue
+                                                elif handled_final_report:
+                                                    # Collect final report content
+                                                    final_report_content.append(content)
+                                                else:
+                                                    # Try to parse JSON data and store; plain text skips the decoder entirely
+                                                    json_data = None
+                                                    if _looks_like_json(content):
+                                                        try:
+                                                            json_data = json_loads(content)
+                                                        except ValueError:
+                                                            pass
+                                                    if isinstance(json_data, dict) and json_data.get("type") == "search" and json_data.get("handler") == "QASearch":
+                                                        handler_param = json_data.get('handlerParam', {})
+                                                        source = handler_param.get('source', '')
+                                                        if source == 'pubmed':
+                                                            bio_search_data.append(json_data)
+                                                            st.write(f"🔍 Found {len(handler_param.get('bioDocs', []))} relevant papers")
+                                                        elif source == 'webSearch':
+                                                            web_search_data.append(json_data)
+                                                            st.write(f"🌐 Found {len(handler_param.get('bioDocs', []))} relevant web pages")
+                                                    elif isinstance(json_data, list) and len(json_data) > 0 and "source" in json_data[0] and "citation" in json_data[0]:
+                                                        # This is citation data
+                                                        bio_citation_data.extend(json_data)
+                                                        st.write(f"📝 Generated citation information, {len(json_data)} citations total")
+                                                    else:
+                                                        # If not JSON, display content normally
+                                                        st.write(content)
+                                            elif data.get('type') == 'done':
+                                                st.success("✅ Answer completed")
                                         
                                         # Process collected final report content
                                         if handled_final_report and final_report_content:
                                             review_final_report_content = "".join(final_report_content).strip()
                                             
-                                            # Always display ToolMessage (collapsible)
-                                            with st.expander(f"🔧 ToolMessage - {tool_count} ({msg.name})", expanded=False):
-                                                st.code(msg.content, language='yaml')
-                                            
-                                            # Display final report in main conversation area
-                                            with messages_container.chat_message("assistant"):
-                                                st.markdown("---")
-                                                st.markdown("### 📚 Literature Review Report")
-                                                st.markdown(review_final_report_content)
-                                                
-                                                # Add download buttons to main conversation area (persistent)
-                                                st.markdown("---")
-                                                st.markdown("### 📥 Download Options")
-                                                col1, col2 = st.columns(2)
-                                                with col1:
-                                                    create_download_button(review_final_report_content, "literature_review", "md", "review_generate")
-                                                with col2:
-                                                    create_download_button(review_final_report_content, "literature_review", "pdf", "review_generate")
-                                            
+                                            _render_review_success(tool_label, msg.content, review_final_report_content, messages_container)
+
                                             # Set flags and output
                                             has_review_final_report = True
                                             output = review_final_report_content
-                                            
-                                            # Save final report to session history with download buttons info
-                                            _append_message_to_session({'role': 'assistant', 'content': review_final_report_content})
-                                            # Also save the original ToolMessage for reference
-                                            _append_message_to_session({'role': 'assistant', 'content': '', 'tool': msg.content})
-                                            
-                                            # Force immediate rerender so Download Options appear without needing a new interaction
-                                            st.rerun()
                                         else:
                                             # Save tool message to session history
-                                            with st.expander(f"🔧 ToolMessage - {tool_count} ({msg.name})", expanded=False):
-                                                st.code(msg.content, language='yaml')
+                                            _render_tool_expander(tool_label, msg.content)
                                             _append_message_to_session({'role': 'assistant', 'content': '', 'tool': msg.content})
                                     else:
                                         # For non-streaming or non-SSE returned tool messages, prioritize parsing bio_qa_stream_chat final answer
                                         if msg.name == "bio_qa_stream_chat":
                                             # Try to extract search data
                                             try:
-                                                import json
-                                                import re
-                                                # Find JSON data blocks
-                                                json_matches = re.findall(r'```bio-chat-agent-task\n(.*?)\n```', msg.content, re.DOTALL)
-                                                for json_str in json_matches:
+                                                # Walk the search and citation blocks in one pass over the content
+                                                for block in _RE_FENCED_BLOCK.finditer(msg.content):
+                                                    kind, block_str = block.group(1), block.group(2)
                                                     try:
-                                                        json_data = json.loads(json_str)
-                                                        if json_data.get("type") == "search" and json_data.get("handler") == "QASearch":
-                                                            handler_param = json_data.get('handlerParam', {})
+                                                        block_data = json_loads(block_str)
+                                                    except json.JSONDecodeError:
+                                                        continue
+                                                    if kind == 'bio-chat-agent-task':
+                                                        if block_data.get("type") == "search" and block_data.get("handler") == "QASearch":
+                                                            handler_param = block_data.get('handlerParam', {})
                                                             source = handler_param.get('source', '')
                                                             if source == 'pubmed':
-                                                                bio_search_data.append(json_data)
-                                                                # Save to session state
-                                                                bio_data['bio_search_data'] = bio_search_data
-                                                                st.session_state[bio_data_key] = bio_data
+                                                                bio_search_data.append(block_data)
                                                             elif source == 'webSearch':
-                                                                web_search_data.append(json_data)
-                                                                # Save to session state
-                                                                bio_data['web_search_data'] = web_search_data
-                                                                st.session_state[bio_data_key] = bio_data
-                                                    except json.JSONDecodeError:
-                                                        continue
-                                                
-                                                # Find citation data blocks
-                                                citation_matches = re.findall(r'```bio-resource-lookup\n(.*?)\n```', msg.content, re.DOTALL)
-                                                for citation_str in citation_matches:
-                                                    try:
-                                                        citation_data = json.loads(citation_str)
-                                                        if isinstance(citation_data, list) and len(citation_data) > 0 and "source" in citation_data[0] and "citation" in citation_data[0]:
-                                                            bio_citation_data.extend(citation_data)
-                                                            # Save to session state
-                                                            bio_data['bio_citation_data'] = bio_citation_data
-                                                            st.session_state[bio_data_key] = bio_data
-                                                    except json.JSONDecodeError:
-                                                        continue
+                                                                web_search_data.append(block_data)
+                                                    elif isinstance(block_data, list) and len(block_data) > 0 and "source" in block_data[0] and "citation" in block_data[0]:
+                                                        bio_citation_data.extend(block_data)
                                             except Exception:
                                                 pass
                                             
-                                            extracted = extract_bio_final_answer(msg.content)
+                                            # The probe check skips the cache-key hash and the scan for content without a final answer
+                                            extracted = (extract_bio_final_answer(msg.content)
+                                                         if _BIO_FINAL_ANSWER_PROBE in msg.content else None)
                                             if extracted:
                                                 # Always display ToolMessage (collapsible)
-                                                with st.expander(f"🔧 ToolMessage - {tool_count} ({msg.name})", expanded=False):
-                                                    st.code(msg.content, language='yaml')
-                                                
+                                                _render_tool_expander(tool_label, msg.content)
+
                                                 # Then display final answer in main conversation area
                                                 with messages_container.chat_message("assistant"):
-                                                    # Display found literature information
-                                                    if bio_search_data or web_search_data:
-                                                        total_bio_docs = sum(len(data.get('handlerParam', {}).get('bioDocs', [])) for data in bio_search_data)
-                                                        total_web_docs = sum(len(data.get('handlerParam', {}).get('bioDocs', [])) for data in web_search_data)
-                                                        total_docs = total_bio_docs + total_web_docs
-                                                        if total_bio_docs > 0 and total_web_docs > 0:
-                                                            st.markdown(f"### 📚 Analysis based on {total_bio_docs} scientific papers and {total_web_docs} web pages")
-                                                        elif total_bio_docs > 0:
-                                                            st.markdown(f"### 📚 Analysis based on {total_bio_docs} scientific papers")
-                                                        else:
-                                                            st.markdown(f"### 🌐 Analysis based on {total_web_docs} web pages")
-                                                    
+                                                    complete_content = _render_bio_final_answer(
+                                                        extracted, bio_search_data, bio_citation_data, web_search_data
+                                                    )
 
-                                                    
-                                                    st.markdown("### 🎯 Final Answer")
-                                                    
-                                                    # Process citation markers in final answer
-                                                    processed_answer = extracted
-                                                    if bio_citation_data and (bio_search_data or web_search_data):
-                                                        # Create docId to literature info mapping
-                                                        doc_id_to_info = {}
-                                                        # Add PubMed data
-                                                        for search_data in bio_search_data:
-                                                            bio_docs = search_data.get('handlerParam', {}).get('bioDocs', [])
-                                                            for doc in bio_docs:
-                                                                doc_id_to_info[doc.get('docId')] = doc
-                                                        # Add web search data
-                                                        for search_data in web_search_data:
-                                                            web_docs = search_data.get('handlerParam', {}).get('bioDocs', [])
-                                                            for doc in web_docs:
-                                                                doc_id_to_info[doc.get('docId')] = doc
-                                                        
-                                                        # Create citation number to docId mapping
-                                                        citation_to_doc = {}
-                                                        for citation in bio_citation_data:
-                                                            citation_num = citation.get('citation')
-                                                            doc_id = citation.get('docId')
-                                                            citation_to_doc[citation_num] = doc_id
-                                                        
-                                                        # Replace citation markers
-                                                        import re
-                                                        # First replace single citations
-                                                        def replace_citation_local2(match):
-                                                            return replace_citation(match, citation_to_doc, doc_id_to_info)
-                                                        processed_answer = re.sub(r'\[bio-rag-citation:(\d+)\]', replace_citation_local2, processed_answer)
-                                                        
-                                                        def replace_footnote_citation_local2(match):
-                                                            return replace_footnote_citation(match, citation_to_doc, doc_id_to_info)
-                                                        processed_answer = re.sub(r'\[\^(\d+)\]', replace_footnote_citation_local2, processed_answer)
-                                                        
-                                                        def replace_document_citation_local2(match):
-                                                            return replace_document_citation(match, citation_to_doc, doc_id_to_info)
-                                                        processed_answer = re.sub(r'\[document (\d+)\]', replace_document_citation_local2, processed_answer)
-                                                        
-                                                        # Remove bottom references section (since we display complete reference list below)
-                                                        processed_answer = re.sub(r'\n\nReferences:.*$', '', processed_answer, flags=re.DOTALL)
-                                                        
-                                                        # Then process consecutive citations, add separators
-                                                        processed_answer = re.sub(r'\](\[)', r'], \1', processed_answer)
-                                                    
-                                                    st.markdown(processed_answer)
-                                                    
-                                                    # Display citation information (moved below final answer)
-                                                    if bio_citation_data:
-                                                        st.markdown(f"### 📖 References ({len(bio_citation_data)} citations)")
-                                                        
-                                                        # Create docId to literature info mapping
-                                                        doc_id_to_info = {}
-                                                        # Add PubMed data
-                                                        for search_data in bio_search_data:
-                                                            bio_docs = search_data.get('handlerParam', {}).get('bioDocs', [])
-                                                            for doc in bio_docs:
-                                                                doc_id_to_info[doc.get('docId')] = doc
-                                                        # Add web search data
-                                                        for search_data in web_search_data:
-                                                            web_docs = search_data.get('handlerParam', {}).get('bioDocs', [])
-                                                            for doc in web_docs:
-                                                                doc_id_to_info[doc.get('docId')] = doc
-                                                        
-                                                        # Display citation list, associate with literature info (standard reference format)
-                                                        for citation in bio_citation_data:
-                                                            doc_id = citation.get('docId')
-                                                            citation_num = citation.get('citation')
-                                                            source = citation.get('source', '')
-                                                            
-                                                            if doc_id in doc_id_to_info:
-                                                                doc_info = doc_id_to_info[doc_id]
-                                                                title = doc_info.get('title', 'N/A')
-                                                                url = doc_info.get('url', '#')
-                                                                
-                                                                if source == 'webSearch':
-                                                                    # Web citation format: [number] title. [link](URL)
-                                                                    st.markdown(f"[{citation_num}] {title}. [Link]({url})")
-                                                                else:
-                                                                    # PubMed literature citation format: [number] author. title. journal info. [link](URL)
-                                                                    author = doc_info.get('author', 'N/A')
-                                                                    journal = doc_info.get('JournalInfo', 'N/A')
-                                                                    
-                                                                    # Process author info, only show first 3
-                                                                    authors = author.split(', ')
-                                                                    if len(authors) > 3:
-                                                                        display_author = ', '.join(authors[:3]) + ' et al.'
-                                                                    else:
-                                                                        display_author = author
-                                                                    
-                                                                    st.markdown(f"[{citation_num}] {display_author}. {title}. {journal}. [Link]({url})")
-                                                            else:
-                                                                st.markdown(f"[{citation_num}] Document ID: {doc_id}")
-                                                    
-                                                # Build complete formatted content for saving
-                                                complete_content = ""
-                                                
-                                                # Add analysis information
-                                                if bio_search_data or web_search_data:
-                                                    total_bio_docs = sum(len(data.get('handlerParam', {}).get('bioDocs', [])) for data in bio_search_data)
-                                                    total_web_docs = sum(len(data.get('handlerParam', {}).get('bioDocs', [])) for data in web_search_data)
-                                                    if total_bio_docs > 0 and total_web_docs > 0:
-                                                        complete_content += f"### 📚 Analysis based on {total_bio_docs} scientific papers and {total_web_docs} web pages\n\n"
-                                                    elif total_bio_docs > 0:
-                                                        complete_content += f"### 📚 Analysis based on {total_bio_docs} scientific papers\n\n"
-                                                    else:
-                                                        complete_content += f"### 🌐 Analysis based on {total_web_docs} web pages\n\n"
-                                                
-                                                # Add final answer
-                                                complete_content += "### 🎯 Final Answer\n\n"
-                                                complete_content += processed_answer + "\n\n"
-                                                
-                                                # Add references
-                                                if bio_citation_data:
-                                                    complete_content += f"### 📖 References ({len(bio_citation_data)} citations)\n\n"
-                                                    
-                                                    # Create docId to literature info mapping
-                                                    doc_id_to_info = {}
-                                                    # Add PubMed data
-                                                    for search_data in bio_search_data:
-                                                        bio_docs = search_data.get('handlerParam', {}).get('bioDocs', [])
-                                                        for doc in bio_docs:
-                                                            doc_id_to_info[doc.get('docId')] = doc
-                                                    # Add web search data
-                                                    for search_data in web_search_data:
-                                                        web_docs = search_data.get('handlerParam', {}).get('bioDocs', [])
-                                                        for doc in web_docs:
-                                                            doc_id_to_info[doc.get('docId')] = doc
-                                                    
-                                                    # Add citation list to complete content
-                                                    for citation in bio_citation_data:
-                                                        doc_id = citation.get('docId')
-                                                        citation_num = citation.get('citation')
-                                                        source = citation.get('source', '')
-                                                        
-                                                        if doc_id in doc_id_to_info:
-                                                            doc_info = doc_id_to_info[doc_id]
-                                                            title = doc_info.get('title', 'N/A')
-                                                            url = doc_info.get('url', '#')
-                                                            
-                                                            if source == 'webSearch':
-                                                                complete_content += f"[{citation_num}] {title}. [Link]({url})\n\n"
-                                                            else:
-                                                                author = doc_info.get('author', 'N/A')
-                                                                journal = doc_info.get('JournalInfo', 'N/A')
-                                                                
-                                                                authors = author.split(', ')
-                                                                if len(authors) > 3:
-                                                                    display_author = ', '.join(authors[:3]) + ' et al.'
-                                                                else:
-                                                                    display_author = author
-                                                                
-                                                                complete_content += f"[{citation_num}] {display_author}. {title}. {journal}. [Link]({url})\n\n"
-                                                        else:
-                                                            complete_content += f"[{citation_num}] Document ID: {doc_id}\n\n"
-                                                
                                                 # Override output and bio_final_answer_content for session recording
                                                 output = complete_content
                                                 bio_final_answer_content = complete_content
@@ -1219,74 +1095,42 @@ def main():
                                                 has_bio_final_answer = True
 
                                                 # Add download buttons for Bio QA final answer (with complete content)
-                                                st.markdown("---")
-                                                st.markdown("### 📥 Download Options")
-                                                col1, col2 = st.columns(2)
-                                                with col1:
-                                                    create_download_button(complete_content, "bio_qa_report", "md", "bio_qa_stream_chat")
-                                                with col2:
-                                                    create_download_button(complete_content, "bio_qa_report", "pdf", "bio_qa_stream_chat")
+                                                _render_download_options(complete_content, "bio_qa_report", "bio_qa_stream_chat")
 
                                                 # Save ToolMessage first, then complete formatted content
-                                                _append_message_to_session({'role': 'assistant', 'content': '', 'tool': msg.content})
-                                                _append_message_to_session({'role': 'assistant', 'content': complete_content})
-                                                
-                                                # Force immediate rerender so Download Options appear right away
-                                                st.rerun()
+                                                _extend_messages_to_session([
+                                                    {'role': 'assistant', 'content': '', 'tool': msg.content},
+                                                    {'role': 'assistant', 'content': complete_content, 'is_bio_report': True},
+                                                ])
 
                                                 # Debug: log ToolMessage save
-                                                logger.log_system_status(f"Saved ToolMessage for bio_qa_stream_chat: {len(msg.content)} characters")
-                                                logger.log_system_status(f"Current chat has {len(st.session_state.get('messages', []))} messages")
+                                                logger.log_system_status(
+                                                    f"Saved ToolMessage for bio_qa_stream_chat: {len(msg.content)} characters, "
+                                                    f"chat now has {len(st.session_state.get('messages', []))} messages"
+                                                )
                                             else:
                                                 # Fallback: if final answer not parsed, display tool message in original way
-                                                with st.expander(f"🔧 ToolMessage - {tool_count} ({msg.name})", expanded=False):
-                                                    st.code(msg.content, language='yaml')
+                                                _render_tool_expander(tool_label, msg.content)
                                                 _append_message_to_session({'role': 'assistant', 'content': '', 'tool': msg.content})
                                         elif msg.name == "review_generate":
                                             # Try to extract final report
-                                            extracted_report = extract_review_final_report(msg.content)
+                                            extracted_report = (extract_review_final_report(msg.content)
+                                                                if _REVIEW_FINAL_REPORT_PROBE in msg.content else None)
                                             if extracted_report:
-                                                # Always display ToolMessage (collapsible)
-                                                with st.expander(f"🔧 ToolMessage - {tool_count} ({msg.name})", expanded=False):
-                                                    st.code(msg.content, language='yaml')
-                                                
-                                                # Display final report in main conversation area
-                                                with messages_container.chat_message("assistant"):
-                                                    st.markdown("---")
-                                                    st.markdown("### 📚 Literature Review Report")
-                                                    st.markdown(extracted_report)
-                                                    
-                                                    # Add download buttons to main conversation area (persistent)
-                                                    st.markdown("---")
-                                                    st.markdown("### 📥 Download Options")
-                                                    col1, col2 = st.columns(2)
-                                                    with col1:
-                                                        create_download_button(extracted_report, "literature_review", "md", "review_generate")
-                                                    with col2:
-                                                        create_download_button(extracted_report, "literature_review", "pdf", "review_generate")
-                                                
+                                                _render_review_success(tool_label, msg.content, extracted_report, messages_container)
+
                                                 # Override output and review_final_report_content for session recording
                                                 output = extracted_report
                                                 review_final_report_content = extracted_report
                                                 # Set flag to skip LLM processing
                                                 has_review_final_report = True
-
-                                                # Save "assistant final report" to session history (instead of writing tool original text to tool field)
-                                                _append_message_to_session({'role': 'assistant', 'content': extracted_report})
-                                                # Also save the original ToolMessage for reference
-                                                _append_message_to_session({'role': 'assistant', 'content': '', 'tool': msg.content})
-                                                
-                                                # Force immediate rerender so Download Options appear right away
-                                                st.rerun()
                                             else:
                                                 # Fallback: if final report not parsed, display tool message in original way
-                                                with st.expander(f"🔧 ToolMessage - {tool_count} ({msg.name})", expanded=False):
-                                                    st.code(msg.content, language='yaml')
+                                                _render_tool_expander(tool_label, msg.content)
                                                 _append_message_to_session({'role': 'assistant', 'content': '', 'tool': msg.content})
                                         else:
                                             # Other tools remain the same, but use collapsible display
-                                            with st.expander(f"🔧 ToolMessage - {tool_count} ({msg.name})", expanded=False):
-                                                st.code(msg.content, language='yaml')
+                                            _render_tool_expander(tool_label, msg.content)
                                             _append_message_to_session({'role': 'assistant', 'content': '', 'tool': msg.content})
                             else:  # AIMessage
                                 # If there's a final answer or final report, skip LLM response
@@ -1329,7 +1173,7 @@ def main():
                         max_tokens=st.session_state['params'].get('max_tokens', DEFAULT_MAX_TOKENS), 
                     )         
                     with messages_container.chat_message("assistant"):
-                        response = st.write_stream(response_stream)
+                        response = _stream_markdown(response_stream)
                         response_dct = {"role": "assistant", "content": response}
             except Exception as e:
                 # Stop monitoring and log error
@@ -1348,7 +1192,10 @@ def main():
                 )
                 
                 st.error(response)
-                st.code(traceback.format_exc(), language="python")
+                # Keep only the innermost frames and leave them collapsed until opened
+                with st.expander("Traceback", expanded=False):
+                    st.code("".join(traceback.format_exception(type(e), e, e.__traceback__, limit=-20)),
+                            language="python")
                 st.stop()
             finally:
                 # Stop monitoring
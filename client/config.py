@@ -1,5 +1,6 @@
 import os
 import json
+from functools import lru_cache
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -17,43 +18,48 @@ MODEL_OPTIONS = {
 # Streamlit defaults
 DEFAULT_MAX_TOKENS = 4096
 DEFAULT_TEMPERATURE = 1.0
+# Show in-flight streamed replies as plain code and render markdown once at the end
+SMOOTH_STREAMING = env('SMOOTH_STREAMING', '1') == '1'
 
 # Environment variable configurations for default settings
-DEFAULT_ENV_CONFIG = {
-    'OpenAI': {
-        'api_key': env('OPENAI_API_KEY'),
-        'base_url': env('OPENAI_BASE_URL', 'https://api.openai.com/v1')
-    },
-    'Antropic': {
-        'api_key': env('ANTHROPIC_API_KEY'),
-        'base_url': env('ANTHROPIC_BASE_URL', 'https://api.anthropic.com')
-    },
-    'Google': {
-        'api_key': env('GOOGLE_API_KEY'),
-        'base_url': env('GOOGLE_BASE_URL', 'https://generativelanguage.googleapis.com/v1beta')
-    },
-    'Bedrock': {
-        'region_name': env('AWS_REGION', 'us-east-1'),
-        'aws_access_key': env('AWS_ACCESS_KEY_ID'),
-        'aws_secret_key': env('AWS_SECRET_ACCESS_KEY')
-    },
-    'Groq': {
-        'api_key': env('GROQ_API_KEY'),
-        'base_url': env('GROQ_BASE_URL', 'https://api.groq.com/openai/v1')
+@lru_cache(maxsize=1)
+def get_env_config():
+    """Provider defaults read from the environment (built on first use)"""
+    return {
+        'OpenAI': {
+            'api_key': env('OPENAI_API_KEY'),
+            'base_url': env('OPENAI_BASE_URL', 'https://api.openai.com/v1')
+        },
+        'Antropic': {
+            'api_key': env('ANTHROPIC_API_KEY'),
+            'base_url': env('ANTHROPIC_BASE_URL', 'https://api.anthropic.com')
+        },
+        'Google': {
+            'api_key': env('GOOGLE_API_KEY'),
+            'base_url': env('GOOGLE_BASE_URL', 'https://generativelanguage.googleapis.com/v1beta')
+        },
+        'Bedrock': {
+            'region_name': env('AWS_REGION', 'us-east-1'),
+            'aws_access_key': env('AWS_ACCESS_KEY_ID'),
+            'aws_secret_key': env('AWS_SECRET_ACCESS_KEY')
+        },
+        'Groq': {
+            'api_key': env('GROQ_API_KEY'),
+            'base_url': env('GROQ_BASE_URL', 'https://api.groq.com/openai/v1')
+        }
     }
-}
+
 
 # Load server configuration
-config_path = os.path.join(os.path.dirname(__file__), 'servers_config.json')
-if os.path.exists(config_path):
-    with open(config_path, 'r', encoding='utf-8') as f:
-        SERVER_CONFIG = json.load(f)
-else:
-    # Fallback: try relative to current working directory
-    config_path = os.path.join('.', 'servers_config.json')
+@lru_cache(maxsize=1)
+def get_server_config():
+    """Parse servers_config.json once per process"""
+    config_path = os.path.join(os.path.dirname(__file__), 'servers_config.json')
+    if not os.path.exists(config_path):
+        # Fallback: try relative to current working directory
+        config_path = os.path.join('.', 'servers_config.json')
     if os.path.exists(config_path):
         with open(config_path, 'r', encoding='utf-8') as f:
-            SERVER_CONFIG = json.load(f)
-    else:
-        # Default empty configuration if file not found
-        SERVER_CONFIG = {"mcpServers": {}}
\ No newline at end of file
+            return json.load(f)
+    # Default empty configuration if file not found
+    return {"mcpServers": {}}
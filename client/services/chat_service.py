@@ -1,7 +1,7 @@
 import streamlit as st
-from config import SERVER_CONFIG
+from config import get_server_config
 import uuid
-import json
+from utils.json_helpers import json_loads
 import os
 from services.logging_service import get_logger
 from services.mcp_service import connect_to_mcp_servers
@@ -18,7 +18,8 @@ def init_session():
         "agent": None,
         "tools": [],
         "tool_executions": [],
-        "servers": SERVER_CONFIG['mcpServers'],
+        # Per-session copy: the sidebar removes servers from this dict
+        "servers": dict(get_server_config()['mcpServers']),
         "auto_connect_attempted": False
     }
     
@@ -26,6 +27,12 @@ def init_session():
         if key not in st.session_state:
             st.session_state[key] = val
 
+    # chat_id -> chat dict index over history_chats (the list keeps sidebar order)
+    if "history_chats_by_id" not in st.session_state:
+        st.session_state["history_chats_by_id"] = {
+            chat['chat_id']: chat for chat in st.session_state["history_chats"]
+        }
+
 
 def auto_connect_to_mcp():
     """Automatically connect to MCP servers on first page load"""
@@ -69,6 +76,17 @@ def auto_connect_to_mcp():
         st.session_state["auto_connect_attempted"] = True
 
 
+@st.cache_data(show_spinner=False)
+def _read_example_file(file_path: str, mtime: float) -> dict:
+    """
+    Parse an example chat file. *mtime* is part of the cache key so edits are
+    picked up; st.cache_data hands back a fresh copy on every hit, so callers
+    may mutate the result.
+    """
+    with open(file_path, 'rb') as f:
+        return json_loads(f.read())
+
+
 def load_example_chats():
     """Load example chat histories from JSON files"""
     example_chats = []
@@ -93,11 +111,10 @@ def load_example_chats():
         file_path = os.path.join(chat_history_dir, example["file"])
         if os.path.exists(file_path):
             try:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    chat_data = json.load(f)
-                    # Update the chat name for display
-                    chat_data['chat_name'] = example["display_name"]
-                    example_chats.append(chat_data)
+                chat_data = _read_example_file(file_path, os.path.getmtime(file_path))
+                # Update the chat name for display
+                chat_data['chat_name'] = example["display_name"]
+                example_chats.append(chat_data)
             except Exception as e:
                 logger = get_logger()
                 logger.log_error("LoadExampleChat", str(e), {"file": example["file"]})
@@ -128,24 +145,49 @@ def get_history():
 
 def get_current_chat(chat_id):
     """Get messages for the current chat."""
-    for chat in st.session_state["history_chats"]:
-        if chat['chat_id'] == chat_id:
-            return chat['messages']
-    return []
+    chat = st.session_state["history_chats_by_id"].get(chat_id)
+    return chat['messages'] if chat is not None else []
+
+def get_current_messages(chat_id):
+    """
+    Get messages for *chat_id*, reusing st.session_state["messages"] when it
+    already holds that chat at its latest history version.
+
+    Each chat in history_chats owns its message list; st.session_state["messages"]
+    is always an alias of the current chat's list, never a copy, so writes
+    through either name land in the same place.
+    """
+    key = (chat_id, st.session_state.get(f"history_version_{chat_id}", 0))
+    if st.session_state.get("messages_key") != key:
+        st.session_state["messages"] = get_current_chat(chat_id)
+        st.session_state["messages_key"] = key
+    return st.session_state["messages"]
 
 def _append_message_to_session(msg: dict) -> None:
     """
     Append *msg* to the current chat’s message list **and**
     keep history_chats in-sync.
     """
+    _extend_messages_to_session([msg])
+
+def _extend_messages_to_session(msgs: list) -> None:
+    """
+    Append several *msgs* at once, syncing history_chats and bumping the
+    history version a single time.
+    """
+    if not msgs:
+        return
     chat_id = st.session_state["current_chat_id"]
-    st.session_state["messages"].append(msg)
-    for chat in st.session_state["history_chats"]:
-        if chat["chat_id"] == chat_id:
-            chat["messages"] = st.session_state["messages"]     # same list
-            if chat["chat_name"] == "New chat":                 # rename once
-                chat["chat_name"] = " ".join(msg["content"].split()[:5]) or "Empty"
-            break
+    chat = st.session_state["history_chats_by_id"].get(chat_id)
+    if chat is not None:
+        # Write through the chat's own list and re-point the alias at it
+        st.session_state["messages"] = chat["messages"]
+    st.session_state["messages"].extend(msgs)
+    version_key = f"history_version_{chat_id}"
+    st.session_state[version_key] = st.session_state.get(version_key, 0) + 1
+    if chat is not None:
+        if chat["chat_name"] == "New chat":                     # rename once
+            chat["chat_name"] = " ".join(msgs[0]["content"].split()[:5]) or "Empty"
 
 def create_chat():
     """Create a new chat session."""
@@ -156,6 +198,7 @@ def create_chat():
                 'messages': []}
     
     st.session_state["history_chats"].append(new_chat)
+    st.session_state["history_chats_by_id"][chat_id] = new_chat
     st.session_state["current_chat_index"] = 0
     st.session_state["current_chat_id"] = chat_id
     
@@ -175,11 +218,7 @@ def delete_chat(chat_id: str):
     logger = get_logger()
     
     # Log chat deletion
-    chat_to_delete = None
-    for chat in st.session_state["history_chats"]:
-        if chat["chat_id"] == chat_id:
-            chat_to_delete = chat
-            break
+    chat_to_delete = st.session_state["history_chats_by_id"].pop(chat_id, None)
     
     if chat_to_delete:
         logger.log_user_action("delete_chat", {
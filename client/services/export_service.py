@@ -1,9 +1,17 @@
 import streamlit as st
-import json
+from utils.json_helpers import json_dumps
 from datetime import datetime
 from typing import List, Dict, Any
 
 
+# Heading that marks a literature review report ("📚 Literature Review Report" contains it too)
+_REVIEW_MARKER = "Literature Review Report"
+
+# Heading emoji per message role; anything else is shown as a tool message
+_ROLE_EMOJI = {"user": "👤", "assistant": "🤖"}
+_ROLE_EMOJI_DEFAULT = "🔧"
+
+
 def format_message_for_export(message: Dict[str, Any]) -> str:
     """
     Format a single message for export to Markdown
@@ -12,25 +20,29 @@ def format_message_for_export(message: Dict[str, Any]) -> str:
     content = message.get("content", "")
     tool = message.get("tool", "")
     
-    formatted = f"## {role.title()}\n\n"
+    # Fast path: plain user text never carries a review report or tool output
+    if role == "user" and not tool and isinstance(content, str):
+        return f"## User\n\n{content}\n\n" if content else "## User\n\n"
+    
+    parts = [f"## {role.title()}\n\n"]
     
     if content:
         # Handle different content types
         if isinstance(content, str):
             # Check if this is a review report
-            if "Literature Review Report" in content or "📚 Literature Review Report" in content:
-                formatted += f"### 📚 Literature Review Report\n\n{content}\n\n"
+            if _REVIEW_MARKER in content:
+                parts.append(f"### 📚 Literature Review Report\n\n{content}\n\n")
                 # Add download note for review reports
-                formatted += "> **Note:** This review report can be downloaded as Markdown or PDF from the main interface.\n\n"
+                parts.append("> **Note:** This review report can be downloaded as Markdown or PDF from the main interface.\n\n")
             else:
-                formatted += f"{content}\n\n"
+                parts.append(f"{content}\n\n")
         else:
-            formatted += f"```\n{content}\n```\n\n"
+            parts.append(f"```\n{content}\n```\n\n")
     
     if tool:
-        formatted += f"### 🔧 Tool Message\n\n```yaml\n{tool}\n```\n\n"
+        parts.append(f"### 🔧 Tool Message\n\n```yaml\n{tool}\n```\n\n")
     
-    return formatted
+    return "".join(parts)
 
 
 def export_chat_to_markdown(chat_data: Dict[str, Any]) -> str:
@@ -41,36 +53,44 @@ def export_chat_to_markdown(chat_data: Dict[str, Any]) -> str:
     chat_name = chat_data.get("chat_name", "Unknown Chat")
     messages = chat_data.get("messages", [])
     
-    # Count message types
-    user_messages = sum(1 for msg in messages if msg.get("role") == "user")
-    assistant_messages = sum(1 for msg in messages if msg.get("role") == "assistant")
-    tool_messages = sum(1 for msg in messages if msg.get("tool"))
-    review_reports = sum(1 for msg in messages if msg.get("role") == "assistant" and 
-                        msg.get("content") and 
-                        ("Literature Review Report" in str(msg.get("content")) or "📚 Literature Review Report" in str(msg.get("content"))))
+    # Count message types in a single pass
+    user_messages = assistant_messages = tool_messages = review_reports = 0
+    for msg in messages:
+        role = msg.get("role")
+        if role == "user":
+            user_messages += 1
+        elif role == "assistant":
+            assistant_messages += 1
+            content = msg.get("content")
+            if content and _REVIEW_MARKER in (content if isinstance(content, str) else str(content)):
+                review_reports += 1
+        if msg.get("tool"):
+            tool_messages += 1
     
     # Create markdown content
-    markdown_content = f"# 💬 Chat: {chat_name}\n\n"
-    markdown_content += f"**Chat ID:** `{chat_id}`\n"
-    markdown_content += f"**Export Date:** {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n"
-    markdown_content += f"**Total Messages:** {len(messages)}\n"
-    markdown_content += f"**Message Breakdown:**\n"
-    markdown_content += f"- 👤 User Messages: {user_messages}\n"
-    markdown_content += f"- 🤖 Assistant Messages: {assistant_messages}\n"
-    markdown_content += f"- 🔧 Tool Messages: {tool_messages}\n"
-    markdown_content += f"- 📚 Review Reports: {review_reports}\n\n"
-    markdown_content += "---\n\n"
+    parts = [
+        f"# 💬 Chat: {chat_name}\n\n",
+        f"**Chat ID:** `{chat_id}`\n",
+        f"**Export Date:** {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n",
+        f"**Total Messages:** {len(messages)}\n",
+        f"**Message Breakdown:**\n",
+        f"- 👤 User Messages: {user_messages}\n",
+        f"- 🤖 Assistant Messages: {assistant_messages}\n",
+        f"- 🔧 Tool Messages: {tool_messages}\n",
+        f"- 📚 Review Reports: {review_reports}\n\n",
+        "---\n\n",
+    ]
     
     # Add each message
     for i, message in enumerate(messages, 1):
         role = message.get("role", "unknown")
-        role_emoji = "👤" if role == "user" else "🤖" if role == "assistant" else "🔧"
+        role_emoji = _ROLE_EMOJI.get(role, _ROLE_EMOJI_DEFAULT)
         
-        markdown_content += f"## {role_emoji} Message {i} ({role.title()})\n\n"
-        markdown_content += format_message_for_export(message)
-        markdown_content += "---\n\n"
+        parts.append(f"## {role_emoji} Message {i} ({role.title()})\n\n")
+        parts.append(format_message_for_export(message))
+        parts.append("---\n\n")
     
-    return markdown_content
+    return "".join(parts)
 
 
 def export_chat_to_json(chat_data: Dict[str, Any]) -> str:
@@ -109,7 +129,7 @@ def export_chat_to_json(chat_data: Dict[str, Any]) -> str:
         "messages": processed_messages
     }
     
-    return json.dumps(export_data, indent=2, ensure_ascii=False)
+    return json_dumps(export_data, indent=True)
 
 
 def get_chat_by_id(chat_id: str) -> Dict[str, Any]:
@@ -117,15 +137,14 @@ def get_chat_by_id(chat_id: str) -> Dict[str, Any]:
     Get a specific chat by its ID from session state
     """
     # If it's the current chat, always build from live session messages to avoid staleness
+    chat = st.session_state.get("history_chats_by_id", {}).get(chat_id)
     current_chat_id = st.session_state.get("current_chat_id")
     if current_chat_id == chat_id:
         current_messages = st.session_state.get("messages", [])
         # Prefer the name from history if available
         chat_name = st.session_state.get("current_chat_name", "Current Chat")
-        for chat in st.session_state.get("history_chats", []):
-            if chat.get("chat_id") == chat_id:
-                chat_name = chat.get("chat_name", chat_name)
-                break
+        if chat is not None:
+            chat_name = chat.get("chat_name", chat_name)
         return {
             "chat_id": chat_id,
             "chat_name": chat_name,
@@ -133,11 +152,23 @@ def get_chat_by_id(chat_id: str) -> Dict[str, Any]:
         }
 
     # Otherwise, return from history if present
-    for chat in st.session_state.get("history_chats", []):
-        if chat.get("chat_id") == chat_id:
-            return chat
-    
-    return None
+    return chat
+
+
+def _get_chat_json_export(chat_data: Dict[str, Any]) -> tuple:
+    """
+    Return (content, filename) for a chat's JSON export, rebuilt only when the
+    chat's history version changes rather than on every sidebar rerun.
+    """
+    chat_id = chat_data["chat_id"]
+    key = (chat_id, chat_data["chat_name"], st.session_state.get(f"history_version_{chat_id}", 0))
+    cached = st.session_state.get("chat_export_cache")
+    if cached is None or cached[0] != key:
+        content = export_chat_to_json(chat_data)
+        filename = f"chat_{chat_data['chat_name'].replace(' ', '_')}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+        cached = (key, (content, filename))
+        st.session_state["chat_export_cache"] = cached
+    return cached[1]
 
 
 def create_download_button_for_chat(chat_id: str, file_format: str = "json"):
@@ -150,8 +181,7 @@ def create_download_button_for_chat(chat_id: str, file_format: str = "json"):
         return
     
     if file_format == "json":
-        content = export_chat_to_json(chat_data)
-        filename = f"chat_{chat_data['chat_name'].replace(' ', '_')}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+        content, filename = _get_chat_json_export(chat_data)
         mime_type = "application/json"
     else:
         st.error("Unsupported file format")
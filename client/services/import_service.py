@@ -1,16 +1,17 @@
 import streamlit as st
 import json
+from utils.json_helpers import json_loads
 import uuid
 from datetime import datetime
-from typing import Dict, Any
+from typing import Dict, Any, Union
 
 
-def parse_json_chat(file_content: str) -> Dict[str, Any]:
+def parse_json_chat(file_content: Union[str, bytes]) -> Dict[str, Any]:
     """
-    Parse a JSON chat file and extract chat data
+    Parse a JSON chat file (str or UTF-8 bytes) and extract chat data
     """
     try:
-        data = json.loads(file_content)
+        data = json_loads(file_content)
         return {
             'chat_id': str(uuid.uuid4()),  # Generate new ID for imported chat
             'chat_name': data.get('chat_name', 'Imported Chat'),
@@ -28,7 +29,8 @@ def import_chat_from_file(uploaded_file) -> Dict[str, Any]:
     if uploaded_file is None:
         return None
     
-    file_content = uploaded_file.read().decode('utf-8')
+    # Raw bytes go straight to the decoder, no intermediate str copy
+    file_content = uploaded_file.getvalue()
     file_name = uploaded_file.name.lower()
     
     if file_name.endswith('.json'):
@@ -48,14 +50,15 @@ def add_imported_chat_to_history(chat_data: Dict[str, Any]):
     
     # Add timestamp to chat name if it's a duplicate
     original_name = chat_data['chat_name']
-    existing_names = [chat['chat_name'] for chat in st.session_state.get('history_chats', [])]
+    name_taken = any(chat['chat_name'] == original_name for chat in st.session_state.get('history_chats', ()))
     
-    if original_name in existing_names:
+    if name_taken:
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         chat_data['chat_name'] = f"{original_name} (Imported {timestamp})"
     
     # Add to history
     st.session_state['history_chats'].append(chat_data)
+    st.session_state['history_chats_by_id'][chat_data['chat_id']] = chat_data
     
     # Switch to the imported chat
     st.session_state['current_chat_index'] = 0
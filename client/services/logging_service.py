@@ -1,8 +1,107 @@
+import atexit
 import logging
 import os
+import queue
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from datetime import datetime
-from typing import Optional, Dict, Any, List
-import json
+from typing import Optional, Dict, Any, Sequence
+from utils.json_helpers import json_dumps
+
+
+def _fmt_ctx(details: Dict[str, Any]) -> str:
+    """格式化附加信息：单个键直接写成 key=value，多个键才走 JSON 编码"""
+    if len(details) == 1:
+        key, value = next(iter(details.items()))
+        return f"{key}={value}"
+    return json_dumps(details)
+
+
+# WARNING 及以上的日志在队列已满时最多等待的秒数（后台线程已停止时不至于卡死调用方）
+_BLOCKING_PUT_TIMEOUT = 5
+
+
+class _DroppingQueueHandler(QueueHandler):
+    """
+    队列已满时丢弃 INFO/DEBUG 日志，避免突发流式输出阻塞界面线程；
+    WARNING 及以上的日志改为阻塞等待入队。丢弃条数会在队列恢复后补记一条警告
+    """
+
+    def __init__(self, queue):
+        super().__init__(queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            if record.levelno < logging.WARNING:
+                self.dropped += 1
+                return
+            try:
+                self.queue.put(record, timeout=_BLOCKING_PUT_TIMEOUT)
+            except queue.Full:
+                self.dropped += 1
+                return
+        if self.dropped:
+            self._report_dropped(record.name)
+
+    def _report_dropped(self, name):
+        dropped, self.dropped = self.dropped, 0
+        summary = logging.makeLogRecord({
+            'name': name, 'levelno': logging.WARNING, 'levelname': 'WARNING',
+            'msg': f"LOG_RECORDS_DROPPED: {dropped} log records dropped (queue full)",
+        })
+        try:
+            self.queue.put(self.prepare(summary), timeout=_BLOCKING_PUT_TIMEOUT)
+        except queue.Full:
+            self.dropped += dropped
+
+
+# 单个日志文件的轮转大小和保留份数
+_LOG_MAX_BYTES = 50 * 1024 * 1024
+_LOG_BACKUP_COUNT = 5
+
+
+class _BufferedFileHandler(RotatingFileHandler):
+    """
+    按大小轮转的日志文件；逐条写入只进缓冲区，由 QueueListener 在队列清空时统一刷新到磁盘
+    """
+
+    def __init__(self, filename, encoding=None):
+        super().__init__(filename, maxBytes=_LOG_MAX_BYTES, backupCount=_LOG_BACKUP_COUNT, encoding=encoding)
+        self._size = os.path.getsize(self.baseFilename) if os.path.exists(self.baseFilename) else 0
+
+    def emit(self, record):
+        # 自行累计文件大小：基类的 shouldRollover 会 seek/tell，把缓冲区提前刷盘
+        try:
+            msg = self.format(record) + self.terminator
+            size = len(msg.encode(self.encoding or 'utf-8', 'replace'))
+            if self._size and self._size + size >= self.maxBytes:
+                self.doRollover()
+                self._size = 0
+            if self.stream is None:
+                self.stream = self._open()
+            self.stream.write(msg)
+            self._size += size
+        except Exception:
+            self.handleError(record)
+
+    def flush(self):
+        pass
+
+    def flush_buffer(self):
+        super().flush()
+
+
+class _BatchingQueueListener(QueueListener):
+    """处理完一批日志（队列为空）后再刷新文件，突发日志合并为一次写入"""
+
+    def handle(self, record):
+        super().handle(record)
+        if self.queue.empty():
+            for handler in self.handlers:
+                if isinstance(handler, _BufferedFileHandler):
+                    handler.flush_buffer()
 
 
 class ChatLogger:
@@ -14,193 +113,195 @@ class ChatLogger:
         self.log_dir = log_dir
         self._ensure_log_dir()
         self._setup_loggers()
+        self._start_queue_listener()
     
     def _ensure_log_dir(self):
         """确保日志目录存在"""
         if not os.path.exists(self.log_dir):
             os.makedirs(self.log_dir)
     
-    def _setup_loggers(self):
-        """设置不同类型的日志记录器"""
-        # 用户行为日志
-        self.user_logger = logging.getLogger('user_actions')
-        self.user_logger.setLevel(logging.INFO)
+    def _mk_logger(self, name: str, emoji: str, filename: str, level: int = logging.INFO,
+                   console_level: Optional[str] = None) -> logging.Logger:
+        """创建一个写入独立日志文件的记录器；给出 console_level 时同时按该级别输出到控制台"""
+        logger = logging.getLogger(name)
+        logger.setLevel(level)
+        logger.propagate = False
         # 防止重复日志
-        self.user_logger.handlers.clear()
+        logger.handlers.clear()
         
-        user_handler = logging.FileHandler(
-            os.path.join(self.log_dir, 'user_actions.log'),
-            encoding='utf-8'
-        )
-        user_formatter = logging.Formatter(
-            '📝 %(asctime)s - %(levelname)s - %(message)s'
-        )
-        user_handler.setFormatter(user_formatter)
-        self.user_logger.addHandler(user_handler)
+        formatter = logging.Formatter(f'{emoji} %(asctime)s - %(levelname)s - %(message)s')
+        file_handler = _BufferedFileHandler(os.path.join(self.log_dir, filename), encoding='utf-8')
+        file_handler.setFormatter(formatter)
+        logger.addHandler(file_handler)
         
-        # 添加控制台输出
-        console_handler = logging.StreamHandler()
-        console_handler.setFormatter(user_formatter)
-        self.user_logger.addHandler(console_handler)
+        # 添加控制台输出（设置 ADMP_LOG_CONSOLE_LEVEL 时才启用）
+        if console_level:
+            console_handler = logging.StreamHandler()
+            console_handler.setLevel(console_level)
+            console_handler.setFormatter(formatter)
+            logger.addHandler(console_handler)
+        return logger
+    
+    def _setup_loggers(self):
+        """设置不同类型的日志记录器"""
+        # 控制台输出默认关闭；设置 ADMP_LOG_CONSOLE_LEVEL（如 WARNING）后只输出该级别及以上的日志
+        console_level = os.environ.get("ADMP_LOG_CONSOLE_LEVEL", "").strip().upper() or None
+        if console_level and not isinstance(logging.getLevelName(console_level), int):
+            console_level = None
         
+        # 用户行为日志
+        self.user_logger = self._mk_logger('user_actions', '📝', 'user_actions.log',
+                                           console_level=console_level)
         # MCP服务日志
-        self.mcp_logger = logging.getLogger('mcp_services')
-        self.mcp_logger.setLevel(logging.INFO)
-        # 防止重复日志
-        self.mcp_logger.handlers.clear()
-        
-        mcp_handler = logging.FileHandler(
-            os.path.join(self.log_dir, 'mcp_services.log'),
-            encoding='utf-8'
-        )
-        mcp_formatter = logging.Formatter(
-            '🔧 %(asctime)s - %(levelname)s - %(message)s'
-        )
-        mcp_handler.setFormatter(mcp_formatter)
-        self.mcp_logger.addHandler(mcp_handler)
-        
-        # 添加控制台输出
-        mcp_console_handler = logging.StreamHandler()
-        mcp_console_handler.setFormatter(mcp_formatter)
-        self.mcp_logger.addHandler(mcp_console_handler)
-        
+        self.mcp_logger = self._mk_logger('mcp_services', '🔧', 'mcp_services.log',
+                                          console_level=console_level)
         # 系统状态日志
-        self.system_logger = logging.getLogger('system_status')
-        self.system_logger.setLevel(logging.INFO)
-        # 防止重复日志
-        self.system_logger.handlers.clear()
-        
-        system_handler = logging.FileHandler(
-            os.path.join(self.log_dir, 'system_status.log'),
-            encoding='utf-8'
-        )
-        system_formatter = logging.Formatter(
-            '🏥 %(asctime)s - %(levelname)s - %(message)s'
-        )
-        system_handler.setFormatter(system_formatter)
-        self.system_logger.addHandler(system_handler)
-        
-        # 添加控制台输出
-        system_console_handler = logging.StreamHandler()
-        system_console_handler.setFormatter(system_formatter)
-        self.system_logger.addHandler(system_console_handler)
-        
+        self.system_logger = self._mk_logger('system_status', '🏥', 'system_status.log',
+                                             console_level=console_level)
         # 错误日志
-        self.error_logger = logging.getLogger('errors')
-        self.error_logger.setLevel(logging.ERROR)
-        # 防止重复日志
-        self.error_logger.handlers.clear()
-        
-        error_handler = logging.FileHandler(
-            os.path.join(self.log_dir, 'errors.log'),
-            encoding='utf-8'
-        )
-        error_formatter = logging.Formatter(
-            '❌ %(asctime)s - %(levelname)s - %(message)s'
-        )
-        error_handler.setFormatter(error_formatter)
-        self.error_logger.addHandler(error_handler)
+        self.error_logger = self._mk_logger('errors', '❌', 'errors.log', logging.ERROR,
+                                            console_level=console_level)
+    
+    def _start_queue_listener(self):
+        """把文件和控制台写入移到后台线程，调用方只需入队"""
+        log_queue = queue.Queue(maxsize=10000)
+        handlers = []
+        for logger in (self.user_logger, self.mcp_logger, self.system_logger, self.error_logger):
+            # 共用一个监听线程，按记录器名称把日志路由回各自的处理器
+            route = logging.Filter(logger.name)
+            for handler in logger.handlers:
+                handler.addFilter(route)
+                handlers.append(handler)
+            logger.handlers.clear()
+            logger.addHandler(_DroppingQueueHandler(log_queue))
         
-        # 添加控制台输出
-        error_console_handler = logging.StreamHandler()
-        error_console_handler.setFormatter(error_formatter)
-        self.error_logger.addHandler(error_console_handler)
+        self._listener = _BatchingQueueListener(log_queue, *handlers, respect_handler_level=True)
+        self._listener.start()
+        atexit.register(self.close)
+    
+    def close(self):
+        """停止后台日志线程，并写出队列中剩余的日志"""
+        if self._listener is not None:
+            self._listener.stop()
+            self._listener = None
     
     def log_user_action(self, action: str, details: Optional[Dict[str, Any]] = None):
         """记录用户行为"""
+        logger = self.user_logger
+        if not logger.isEnabledFor(logging.INFO):
+            return
         message = f"USER_ACTION: {action}"
         if details:
-            message += f" - Details: {json.dumps(details, ensure_ascii=False)}"
-        self.user_logger.info(message)
+            message += f" - Details: {_fmt_ctx(details)}"
+        logger.info(message)
     
     def log_mcp_connection(self, server_name: str, server_url: str, success: bool, error: Optional[str] = None):
         """记录MCP服务器连接"""
-        status = "SUCCESS" if success else "FAILED"
-        message = f"MCP_CONNECTION: {server_name} ({server_url}) - {status}"
-        if error:
-            message += f" - Error: {error}"
-        self.mcp_logger.info(message)
+        logger = self.mcp_logger
+        if not logger.isEnabledFor(logging.INFO):
+            return
+        logger.info(
+            f"MCP_CONNECTION: {server_name} ({server_url}) - {'SUCCESS' if success else 'FAILED'}"
+            f"{f' - Error: {error}' if error else ''}"
+        )
     
     def log_mcp_tool_call(self, tool_name: str, input_data: Dict[str, Any], chat_id: Optional[str] = None):
         """记录MCP工具调用"""
-        message = f"MCP_TOOL_CALL: {tool_name}"
-        if chat_id:
-            message += f" - ChatID: {chat_id}"
-        message += f" - Input: {json.dumps(input_data, ensure_ascii=False)}"
-        self.mcp_logger.info(message)
+        logger = self.mcp_logger
+        if not logger.isEnabledFor(logging.INFO):
+            return
+        logger.info(
+            f"MCP_TOOL_CALL: {tool_name}{f' - ChatID: {chat_id}' if chat_id else ''}"
+            f" - Input: {json_dumps(input_data)}"
+        )
     
     def log_mcp_tool_response(self, tool_name: str, response_data: Any, chat_id: Optional[str] = None):
         """记录MCP工具响应"""
-        message = f"MCP_TOOL_RESPONSE: {tool_name}"
-        if chat_id:
-            message += f" - ChatID: {chat_id}"
-        
-        # 对于大型响应，只记录摘要
-        if isinstance(response_data, str) and len(response_data) > 1000:
-            message += f" - Response: {response_data[:500]}... (truncated, total length: {len(response_data)})"
+        logger = self.mcp_logger
+        if not logger.isEnabledFor(logging.INFO):
+            return
+        # 对于大型响应，只记录摘要；字符串先按长度判断再切片，不做整体序列化
+        if isinstance(response_data, str):
+            size = len(response_data)
+            if size > 1000:
+                response = f"{response_data[:500]}... (truncated, total length: {size})"
+            else:
+                response = json_dumps(response_data)
         else:
-            message += f" - Response: {json.dumps(response_data, ensure_ascii=False)}"
+            response = json_dumps(response_data)
+            size = len(response)
+            if size > 1000:
+                response = f"{response[:500]}... (truncated, total length: {size})"
         
-        self.mcp_logger.info(message)
+        logger.info(f"MCP_TOOL_RESPONSE: {tool_name}{f' - ChatID: {chat_id}' if chat_id else ''} - Response: {response}")
     
-    def log_mcp_agent_usage(self, agent_type: str, tools_used: List[str], chat_id: Optional[str] = None):
-        """记录MCP代理使用情况"""
+    def log_mcp_agent_usage(self, agent_type: str, tools_used: Optional[Sequence[str]] = None,
+                            chat_id: Optional[str] = None, tools_joined: Optional[str] = None):
+        """记录MCP代理使用情况；传入已拼接好的 tools_joined 时可省略 tools_used"""
+        logger = self.mcp_logger
+        if not logger.isEnabledFor(logging.INFO):
+            return
+        chat_part = f" - ChatID: {chat_id}" if chat_id else ""
+        if tools_joined is None:
+            tools_joined = ', '.join(tools_used or ())
         if agent_type == "ReactAgent":
-            message = f"MCP_AGENT_AVAILABLE: {agent_type}"
-            if chat_id:
-                message += f" - ChatID: {chat_id}"
-            message += f" - Available Tools: {', '.join(tools_used)}"
+            logger.info(f"MCP_AGENT_AVAILABLE: {agent_type}{chat_part} - Available Tools: {tools_joined}")
         else:
-            message = f"MCP_AGENT_USAGE: {agent_type}"
-            if chat_id:
-                message += f" - ChatID: {chat_id}"
-            message += f" - Tools Used: {', '.join(tools_used)}"
-        self.mcp_logger.info(message)
+            logger.info(f"MCP_AGENT_USAGE: {agent_type}{chat_part} - Tools Used: {tools_joined}")
     
     def log_chat_message(self, role: str, content: str, chat_id: Optional[str] = None, has_tool: bool = False):
         """记录聊天消息"""
-        message = f"CHAT_MESSAGE: {role.upper()}"
-        if chat_id:
-            message += f" - ChatID: {chat_id}"
-        if has_tool:
-            message += " - HasTool: True"
-        
+        logger = self.user_logger
+        if not logger.isEnabledFor(logging.INFO):
+            return
         # 对于长消息，只记录摘要
-        if len(content) > 500:
-            message += f" - Content: {content[:200]}... (truncated, total length: {len(content)})"
-        else:
-            message += f" - Content: {content}"
+        size = len(content)
+        if size > 500:
+            content = f"{content[:200]}... (truncated, total length: {size})"
         
-        self.user_logger.info(message)
+        logger.info(
+            f"CHAT_MESSAGE: {role.upper()}{f' - ChatID: {chat_id}' if chat_id else ''}"
+            f"{' - HasTool: True' if has_tool else ''} - Content: {content}"
+        )
     
     def log_llm_test(self, provider: str, success: bool, error: Optional[str] = None):
         """记录LLM连接测试"""
-        status = "SUCCESS" if success else "FAILED"
-        message = f"LLM_TEST: {provider} - {status}"
-        if error:
-            message += f" - Error: {error}"
-        self.system_logger.info(message)
+        logger = self.system_logger
+        if not logger.isEnabledFor(logging.INFO):
+            return
+        logger.info(
+            f"LLM_TEST: {provider} - {'SUCCESS' if success else 'FAILED'}{f' - Error: {error}' if error else ''}"
+        )
     
     def log_system_status(self, status: str, details: Optional[Dict[str, Any]] = None):
         """记录系统状态"""
+        logger = self.system_logger
+        if not logger.isEnabledFor(logging.INFO):
+            return
         message = f"SYSTEM_STATUS: {status}"
         if details:
-            message += f" - Details: {json.dumps(details, ensure_ascii=False)}"
-        self.system_logger.info(message)
+            message += f" - Details: {_fmt_ctx(details)}"
+        logger.info(message)
     
     def log_error(self, error_type: str, error_message: str, context: Optional[Dict[str, Any]] = None):
         """记录错误"""
+        logger = self.error_logger
+        if not logger.isEnabledFor(logging.ERROR):
+            return
         message = f"ERROR: {error_type} - {error_message}"
         if context:
-            message += f" - Context: {json.dumps(context, ensure_ascii=False)}"
-        self.error_logger.error(message)
+            message += f" - Context: {_fmt_ctx(context)}"
+        logger.error(message)
     
     def log_long_running_task(self, task_name: str, duration_seconds: float, chat_id: Optional[str] = None):
         """记录长时间运行的任务"""
-        message = f"LONG_RUNNING_TASK: {task_name} - Duration: {duration_seconds:.2f}s"
-        if chat_id:
-            message += f" - ChatID: {chat_id}"
-        self.system_logger.info(message)
+        logger = self.system_logger
+        if not logger.isEnabledFor(logging.INFO):
+            return
+        logger.info(
+            f"LONG_RUNNING_TASK: {task_name} - Duration: {duration_seconds:.2f}s"
+            f"{f' - ChatID: {chat_id}' if chat_id else ''}"
+        )
 
 
 # 全局日志记录器实例
@@ -1,4 +1,4 @@
-from typing import Dict, List
+from typing import Dict, List, Tuple
 import streamlit as st
 
 from langchain_mcp_adapters.client import MultiServerMCPClient
@@ -18,6 +18,12 @@ async def get_tools_from_client(client: MultiServerMCPClient) -> List[BaseTool]:
     """Get tools from the MCP client."""
     return await client.get_tools()
 
+async def setup_mcp_client_and_tools(server_config: Dict[str, Dict]) -> Tuple[MultiServerMCPClient, List[BaseTool]]:
+    """Initialize the MCP client and fetch its tools in a single event-loop run."""
+    client = await setup_mcp_client(server_config)
+    tools = await get_tools_from_client(client)
+    return client, tools
+
 async def run_agent(agent, message: str) -> Dict:
     """Run the agent with the provided message."""
     return await agent.ainvoke({"messages": message})
@@ -26,6 +32,15 @@ async def run_tool(tool, **kwargs):
     """Run a tool with the provided parameters."""
     return await tool.ainvoke(**kwargs)
 
+def get_tool_names_joined() -> str:
+    """Comma-joined names of the connected tools, cached until the tool list is replaced."""
+    tools = st.session_state.get("tools", [])
+    cached = st.session_state.get("tool_names_joined")
+    if cached is None or cached[0] is not tools:
+        cached = (tools, ', '.join(tool.name for tool in tools))
+        st.session_state["tool_names_joined"] = cached
+    return cached[1]
+
 def connect_to_mcp_servers():
     logger = get_logger()
     
@@ -53,8 +68,9 @@ def connect_to_mcp_servers():
     
     # Setup new client
     try:
-        st.session_state.client = run_async(setup_mcp_client(st.session_state.servers))
-        st.session_state.tools = run_async(get_tools_from_client(st.session_state.client))
+        st.session_state.client, st.session_state.tools = run_async(
+            setup_mcp_client_and_tools(st.session_state.servers)
+        )
         st.session_state.agent = create_react_agent(llm, st.session_state.tools)
         
         # Log successful connection
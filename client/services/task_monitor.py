@@ -1,10 +1,27 @@
 import asyncio
+import heapq
 import time
 from datetime import datetime, timedelta
-from typing import Optional, Callable, Dict, Any
+from typing import Optional, Callable, Dict, Any, List, Tuple
 from services.logging_service import get_logger
 
 
+class _Task:
+    """单个被监控任务的状态"""
+    __slots__ = ('task_name', 'chat_id', 'start_time', 'heartbeat_callback',
+                 'last_heartbeat', 'next_heartbeat', 'heartbeat_count')
+
+    def __init__(self, task_name: str, chat_id: Optional[str], start_time: float,
+                 heartbeat_callback: Optional[Callable], next_heartbeat: float):
+        self.task_name = task_name
+        self.chat_id = chat_id
+        self.start_time = start_time
+        self.heartbeat_callback = heartbeat_callback
+        self.last_heartbeat = start_time
+        self.next_heartbeat = next_heartbeat
+        self.heartbeat_count = 0
+
+
 class LongRunningTaskMonitor:
     """
     长时间运行任务监控器，用于在MCP工具执行期间定期发送心跳
@@ -13,7 +30,9 @@ class LongRunningTaskMonitor:
     def __init__(self, heartbeat_interval: int = 300):  # 5分钟 = 300秒
         self.heartbeat_interval = heartbeat_interval
         self.logger = get_logger()
-        self.active_tasks: Dict[str, Dict[str, Any]] = {}
+        self.active_tasks: Dict[str, _Task] = {}
+        # (下次心跳时间, task_id) 小顶堆；任务结束或时间变更后的旧条目在出堆时丢弃
+        self._heartbeat_heap: List[Tuple[float, str]] = []
     
     def start_monitoring(self, task_id: str, task_name: str, chat_id: Optional[str] = None, 
                         heartbeat_callback: Optional[Callable] = None):
@@ -26,14 +45,11 @@ class LongRunningTaskMonitor:
             chat_id: 聊天ID
             heartbeat_callback: 心跳回调函数
         """
-        self.active_tasks[task_id] = {
-            'task_name': task_name,
-            'chat_id': chat_id,
-            'start_time': time.time(),
-            'heartbeat_callback': heartbeat_callback,
-            'last_heartbeat': time.time(),
-            'heartbeat_count': 0
-        }
+        # 时长计算使用单调时钟，不受系统时间调整影响
+        now = time.monotonic()
+        task_info = _Task(task_name, chat_id, now, heartbeat_callback, now + self.heartbeat_interval)
+        self.active_tasks[task_id] = task_info
+        heapq.heappush(self._heartbeat_heap, (task_info.next_heartbeat, task_id))
         
         self.logger.log_system_status(
             f"Started monitoring long-running task: {task_name}",
@@ -49,56 +65,72 @@ class LongRunningTaskMonitor:
         """
         if task_id in self.active_tasks:
             task_info = self.active_tasks[task_id]
-            duration = time.time() - task_info['start_time']
+            duration = time.monotonic() - task_info.start_time
             
             self.logger.log_long_running_task(
-                task_info['task_name'],
+                task_info.task_name,
                 duration,
-                task_info['chat_id']
+                task_info.chat_id
             )
             
             del self.active_tasks[task_id]
+            self._compact_heap()
+    
+    def _compact_heap(self):
+        """
+        丢弃已结束任务留下的旧堆条目；监控循环未运行时没有人出堆，否则堆会随任务次数无限增长
+        """
+        if not self.active_tasks:
+            self._heartbeat_heap.clear()
+        elif len(self._heartbeat_heap) > 2 * len(self.active_tasks) + 16:
+            self._heartbeat_heap = [(task_info.next_heartbeat, task_id)
+                                    for task_id, task_info in self.active_tasks.items()]
+            heapq.heapify(self._heartbeat_heap)
     
-    async def send_heartbeat(self, task_id: str):
+    async def send_heartbeat(self, task_id: str, current_time: Optional[float] = None):
         """
         发送心跳信号
         
         Args:
             task_id: 任务唯一标识
+            current_time: 当前的 time.monotonic() 值，批量检查时由调用方传入
         """
         if task_id not in self.active_tasks:
             return
         
         task_info = self.active_tasks[task_id]
-        current_time = time.time()
+        if current_time is None:
+            current_time = time.monotonic()
         
         # 检查是否需要发送心跳
-        if current_time - task_info['last_heartbeat'] >= self.heartbeat_interval:
-            task_info['last_heartbeat'] = current_time
-            task_info['heartbeat_count'] += 1
+        if task_info.next_heartbeat <= current_time:
+            task_info.last_heartbeat = current_time
+            task_info.next_heartbeat = current_time + self.heartbeat_interval
+            task_info.heartbeat_count += 1
+            heapq.heappush(self._heartbeat_heap, (task_info.next_heartbeat, task_id))
             
-            duration = current_time - task_info['start_time']
+            duration = current_time - task_info.start_time
             
             # 记录心跳日志
             self.logger.log_system_status(
-                f"Heartbeat for long-running task: {task_info['task_name']}",
+                f"Heartbeat for long-running task: {task_info.task_name}",
                 {
                     'task_id': task_id,
-                    'chat_id': task_info['chat_id'],
+                    'chat_id': task_info.chat_id,
                     'duration_seconds': duration,
-                    'heartbeat_count': task_info['heartbeat_count']
+                    'heartbeat_count': task_info.heartbeat_count
                 }
             )
             
             # 执行心跳回调
-            if task_info['heartbeat_callback']:
+            if task_info.heartbeat_callback:
                 try:
-                    await task_info['heartbeat_callback'](task_id, task_info)
+                    await task_info.heartbeat_callback(task_id, task_info)
                 except Exception as e:
                     self.logger.log_error(
                         "HeartbeatCallbackError",
                         str(e),
-                        {'task_id': task_id, 'task_name': task_info['task_name']}
+                        {'task_id': task_id, 'task_name': task_info.task_name}
                     )
     
     async def monitor_all_tasks(self):
@@ -107,12 +139,22 @@ class LongRunningTaskMonitor:
         """
         while True:
             try:
-                # 为每个活跃任务发送心跳
-                for task_id in list(self.active_tasks.keys()):
-                    await self.send_heartbeat(task_id)
+                # 按到期时间出堆，只为到期的任务发送心跳
+                now = time.monotonic()
+                heap = self._heartbeat_heap
+                while heap and heap[0][0] <= now:
+                    due, task_id = heapq.heappop(heap)
+                    task_info = self.active_tasks.get(task_id)
+                    # 任务已结束或已改期的旧条目直接丢弃
+                    if task_info is None or task_info.next_heartbeat != due:
+                        continue
+                    await self.send_heartbeat(task_id, now)
                 
-                # 等待下一次检查
-                await asyncio.sleep(60)  # 每分钟检查一次
+                # 睡到最近一个任务到期，最长一分钟（期间可能有新任务加入）
+                delay = 60
+                if heap:
+                    delay = min(delay, max(0.0, heap[0][0] - time.monotonic()))
+                await asyncio.sleep(delay)
                 
             except Exception as e:
                 self.logger.log_error(
@@ -130,16 +172,16 @@ class LongRunningTaskMonitor:
             活跃任务信息字典
         """
         result = {}
-        current_time = time.time()
+        current_time = time.monotonic()
         
         for task_id, task_info in self.active_tasks.items():
-            duration = current_time - task_info['start_time']
+            duration = current_time - task_info.start_time
             result[task_id] = {
-                'task_name': task_info['task_name'],
-                'chat_id': task_info['chat_id'],
+                'task_name': task_info.task_name,
+                'chat_id': task_info.chat_id,
                 'duration_seconds': duration,
-                'heartbeat_count': task_info['heartbeat_count'],
-                'last_heartbeat_seconds_ago': current_time - task_info['last_heartbeat']
+                'heartbeat_count': task_info.heartbeat_count,
+                'last_heartbeat_seconds_ago': current_time - task_info.last_heartbeat
             }
         
         return result
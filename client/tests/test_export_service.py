@@ -0,0 +1,70 @@
+import sys
+import types
+import unittest
+from unittest import mock
+
+try:
+    import streamlit  # noqa: F401
+except ImportError:
+    # 测试只用到 session_state / download_button，未安装 streamlit 时占位即可
+    sys.modules["streamlit"] = types.ModuleType("streamlit")
+
+from services import export_service
+
+
+class _FakeStreamlit:
+    def __init__(self):
+        self.session_state = {}
+        self.downloads = []
+
+    def download_button(self, **kwargs):
+        self.downloads.append(kwargs)
+
+    def error(self, message):
+        raise AssertionError(message)
+
+
+class ChatJsonExportCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.st = _FakeStreamlit()
+        chat = {
+            "chat_id": "c1",
+            "chat_name": "Gene question",
+            "messages": [{"role": "user", "content": "What does TP53 do?"}],
+        }
+        self.st.session_state.update({
+            "history_chats_by_id": {"c1": chat},
+            "current_chat_id": "other",
+        })
+        patcher = mock.patch.object(export_service, "st", self.st)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_download_button_reuses_cached_export(self):
+        with mock.patch.object(export_service, "export_chat_to_json",
+                               wraps=export_service.export_chat_to_json) as export:
+            export_service.create_download_button_for_chat("c1")
+            export_service.create_download_button_for_chat("c1")
+
+        self.assertEqual(export.call_count, 1)
+        self.assertEqual(len(self.st.downloads), 2)
+        first, second = self.st.downloads
+        self.assertEqual(first["data"], second["data"])
+        self.assertEqual(first["file_name"], second["file_name"])
+        self.assertTrue(first["file_name"].startswith("chat_Gene_question_"))
+        self.assertIn("TP53", first["data"])
+
+    def test_new_history_version_rebuilds_export(self):
+        chat = self.st.session_state["history_chats_by_id"]["c1"]
+        content, _ = export_service._get_chat_json_export(chat)
+        chat["messages"].append({"role": "assistant", "content": "A tumour suppressor."})
+        self.st.session_state["history_version_c1"] = 1
+
+        updated, _ = export_service._get_chat_json_export(chat)
+
+        self.assertNotIn("tumour suppressor", content)
+        self.assertIn("tumour suppressor", updated)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,64 @@
+import logging
+import os
+import queue
+import tempfile
+import threading
+import unittest
+
+# 导入 logging_service 会在当前目录创建 logs/，放到临时目录里
+_cwd = os.getcwd()
+os.chdir(tempfile.mkdtemp())
+try:
+    from services.logging_service import _DroppingQueueHandler
+finally:
+    os.chdir(_cwd)
+
+
+def _record(level, msg):
+    return logging.makeLogRecord({'name': 'mcp_services', 'levelno': level,
+                                  'levelname': logging.getLevelName(level), 'msg': msg})
+
+
+class DroppingQueueHandlerTest(unittest.TestCase):
+    def setUp(self):
+        self.queue = queue.Queue(maxsize=1)
+        self.handler = _DroppingQueueHandler(self.queue)
+
+    def test_info_records_are_dropped_and_counted_when_full(self):
+        self.handler.emit(_record(logging.INFO, "first"))
+        self.handler.emit(_record(logging.INFO, "second"))
+        self.handler.emit(_record(logging.INFO, "third"))
+
+        self.assertEqual(self.handler.dropped, 2)
+        self.assertEqual(self.queue.get_nowait().getMessage(), "first")
+
+    def test_drop_count_is_reported_once_the_queue_drains(self):
+        self.handler.emit(_record(logging.INFO, "first"))
+        self.handler.emit(_record(logging.INFO, "dropped"))
+        self.queue.get_nowait()
+        self.queue.maxsize = 2
+
+        self.handler.emit(_record(logging.INFO, "after"))
+
+        self.assertEqual(self.queue.get_nowait().getMessage(), "after")
+        summary = self.queue.get_nowait()
+        self.assertEqual(summary.levelno, logging.WARNING)
+        self.assertEqual(summary.name, 'mcp_services')
+        self.assertIn("1 log records dropped", summary.getMessage())
+        self.assertEqual(self.handler.dropped, 0)
+
+    def test_error_records_wait_for_room_instead_of_dropping(self):
+        self.handler.emit(_record(logging.INFO, "first"))
+        # 模拟后台线程取走一条，让阻塞的 put 能继续
+        timer = threading.Timer(0.05, self.queue.get_nowait)
+        timer.start()
+
+        self.handler.emit(_record(logging.ERROR, "tool failed"))
+        timer.join()
+
+        self.assertEqual(self.handler.dropped, 0)
+        self.assertEqual(self.queue.get_nowait().getMessage(), "tool failed")
+
+
+if __name__ == "__main__":
+    unittest.main()
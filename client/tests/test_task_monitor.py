@@ -0,0 +1,40 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+# 导入 logging_service 会在当前目录创建 logs/，放到临时目录里
+_cwd = os.getcwd()
+os.chdir(tempfile.mkdtemp())
+try:
+    from services.task_monitor import LongRunningTaskMonitor
+finally:
+    os.chdir(_cwd)
+
+
+class HeartbeatHeapTest(unittest.TestCase):
+    def setUp(self):
+        self.monitor = LongRunningTaskMonitor(heartbeat_interval=300)
+        self.monitor.logger = mock.Mock()
+
+    def test_heap_does_not_grow_across_start_stop_cycles(self):
+        for i in range(1000):
+            self.monitor.start_monitoring(f"task-{i}", "review_generate", chat_id="c1")
+            self.monitor.stop_monitoring(f"task-{i}")
+
+        self.assertEqual(self.monitor.active_tasks, {})
+        self.assertEqual(self.monitor._heartbeat_heap, [])
+
+    def test_heap_stays_bounded_while_other_tasks_run(self):
+        self.monitor.start_monitoring("long", "bio_qa_stream_chat")
+        for i in range(1000):
+            self.monitor.start_monitoring(f"task-{i}", "review_generate")
+            self.monitor.stop_monitoring(f"task-{i}")
+
+        heap = self.monitor._heartbeat_heap
+        self.assertLessEqual(len(heap), 2 * len(self.monitor.active_tasks) + 16)
+        self.assertIn((self.monitor.active_tasks["long"].next_heartbeat, "long"), heap)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,10 +1,105 @@
 import streamlit as st
 import os
+import re
 from datetime import datetime, timedelta
 from services.logging_service import get_logger
 from services.task_monitor import get_task_monitor
 
 
+# 倒序读取日志文件时每次读入的块大小
+_TAIL_BLOCK_SIZE = 64 * 1024
+# 日志查看器最多显示的行数
+_MAX_DISPLAY_LINES = 1000
+
+
+def _iter_lines_reversed(path: str):
+    """从文件末尾按块向前读取，逐行倒序产出（bytes，不含换行符）"""
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        pos = f.tell()
+        remainder = b''
+        while pos > 0:
+            step = min(_TAIL_BLOCK_SIZE, pos)
+            pos -= step
+            f.seek(pos)
+            pieces = (f.read(step) + remainder).split(b'\n')
+            # 块首可能是半行，留到下一块拼接
+            remainder = pieces.pop(0)
+            yield from reversed(pieces)
+        yield remainder
+
+
+def _parse_log_time(line: str):
+    """解析日志行开头的时间戳（跳过表情前缀），无法解析时返回 None"""
+    timestamp_str = line.split(' - ', 1)[0]
+    # 日志行以表情和空格开头，例如 "🔧 2025-01-01 12:00:00,000"
+    if timestamp_str and not timestamp_str[0].isdigit():
+        timestamp_str = timestamp_str.split(' ', 1)[-1]
+    try:
+        return datetime.strptime(timestamp_str, '%Y-%m-%d %H:%M:%S,%f')
+    except ValueError:
+        return None
+
+
+def _log_timestamp(line: str):
+    """
+    取日志行的时间戳字符串，如 "2025-01-01 12:00:00,000"。格式固定宽度，
+    按字符串比较即按时间先后比较，无需逐行 strptime；无法识别时返回 None
+    """
+    # 常见格式：单个表情 + 空格 + 时间戳
+    ts = line[:23] if line[:1].isdigit() else line[2:25]
+    if len(ts) == 23 and ts[4] == '-' and ts[19] == ',' and ts[:4].isdigit():
+        return ts
+    # 其他前缀时退回完整解析
+    log_time = _parse_log_time(line)
+    return log_time.strftime('%Y-%m-%d %H:%M:%S,%f')[:23] if log_time else None
+
+
+def _tail(path: str, cutoff=None, search: str = "", max_lines: int = _MAX_DISPLAY_LINES):
+    """
+    倒序读取日志，遇到早于 cutoff 的行即停止，只保留最近 max_lines 条匹配行
+
+    Returns:
+        (lines, total, matched)：保留的行（按时间顺序）、时间范围内的行数、匹配搜索的行数
+    """
+    kept = []
+    total = matched = 0
+    # 搜索词只编译一次，逐行匹配时不再 lower() 整行
+    pattern = re.compile(re.escape(search), re.IGNORECASE) if search else None
+    cutoff_str = cutoff.strftime('%Y-%m-%d %H:%M:%S,%f')[:23] if cutoff is not None else None
+    for raw in _iter_lines_reversed(path):
+        if not raw:
+            continue
+        line = raw.decode('utf-8', 'replace') + '\n'
+        if cutoff_str is not None:
+            log_ts = _log_timestamp(line)
+            # 日志按时间顺序写入，之前的行都更早；无法解析时间戳的行保留
+            if log_ts is not None and log_ts < cutoff_str:
+                break
+        total += 1
+        if pattern is not None and pattern.search(line) is None:
+            continue
+        matched += 1
+        if len(kept) < max_lines:
+            kept.append(line)
+    kept.reverse()
+    return kept, total, matched
+
+
+@st.cache_data(ttl=5, max_entries=32, show_spinner=False)
+def _load_log(path: str, mtime: float, hours: int, search: str):
+    """
+    读取并过滤日志，结果按 (文件, 修改时间, 时间范围, 搜索词) 缓存，
+    切换选项或重复渲染时不必重新读取文件
+
+    Returns:
+        (text, total, matched)：要显示的日志文本、时间范围内的行数、匹配搜索的行数
+    """
+    cutoff_time = datetime.now() - timedelta(hours=hours) if hours > 0 else None
+    lines, total, matched = _tail(path, cutoff_time, search)
+    return ''.join(lines), total, matched
+
+
 def create_log_viewer():
     """
     创建日志查看器组件
@@ -45,52 +140,35 @@ def create_log_viewer():
     log_path = os.path.join("logs", log_file)
     
     if os.path.exists(log_path):
-        # 读取日志文件
-        with open(log_path, 'r', encoding='utf-8') as f:
-            lines = f.readlines()
-        
-        # 过滤时间范围
-        if time_ranges[selected_range] > 0:
-            cutoff_time = datetime.now() - timedelta(hours=time_ranges[selected_range])
-            filtered_lines = []
-            
-            for line in lines:
-                try:
-                    # 解析时间戳
-                    timestamp_str = line.split(' - ')[0]
-                    log_time = datetime.strptime(timestamp_str, '%Y-%m-%d %H:%M:%S,%f')
-                    if log_time >= cutoff_time:
-                        filtered_lines.append(line)
-                except:
-                    # 如果无法解析时间戳，保留该行
-                    filtered_lines.append(line)
-            
-            lines = filtered_lines
+        # 按时间范围和搜索词过滤；搜索框的值在本轮运行开始时已写入 session_state，可先用于读取
+        text, total, matched = _load_log(
+            log_path,
+            os.path.getmtime(log_path),
+            time_ranges[selected_range],
+            st.session_state.get("log_search", "")
+        )
         
         # 显示日志
-        if lines:
-            st.markdown(f"**Showing {len(lines)} log entries**")
+        if total:
+            st.markdown(f"**Showing {total} log entries**")
             
             # 搜索功能
-            search_term = st.text_input("Search in logs (e.g., 'bio_qa_stream_chat', 'review_generate')", "")
+            search_term = st.text_input("Search in logs (e.g., 'bio_qa_stream_chat', 'review_generate')", "", key="log_search")
             if search_term:
-                lines = [line for line in lines if search_term.lower() in line.lower()]
-                st.markdown(f"**Found {len(lines)} matching entries**")
+                st.markdown(f"**Found {matched} matching entries**")
             
             # 显示日志内容
-            if lines:
+            if text:
                 # 只显示最后1000行以避免性能问题
-                display_lines = lines[-1000:] if len(lines) > 1000 else lines
-                
                 st.text_area(
                     "Log Content",
-                    value=''.join(display_lines),
+                    value=text,
                     height=400,
                     disabled=True
                 )
                 
-                if len(lines) > 1000:
-                    st.info(f"Showing last 1000 lines of {len(lines)} total entries")
+                if matched > _MAX_DISPLAY_LINES:
+                    st.info(f"Showing last {_MAX_DISPLAY_LINES} lines of {matched} total entries")
             else:
                 st.info("No log entries found matching the criteria")
         else:
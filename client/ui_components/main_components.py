@@ -1,3 +1,4 @@
+import datetime
 import streamlit as st
 import json
 
@@ -9,5 +10,7 @@ def display_tool_executions():
                 st.markdown(f"### Execution #{i+1}: `{exec_record['tool_name']}`")
                 st.markdown(f"**Input:** ```json{json.dumps(exec_record['input'])}```")
                 st.markdown(f"**Output:** ```{exec_record['output'][:250]}...```")
-                st.markdown(f"**Time:** {exec_record['timestamp']}")
+                # Timestamps are stored as epoch seconds and only formatted for display
+                timestamp = datetime.datetime.fromtimestamp(exec_record['timestamp']).strftime('%Y-%m-%d %H:%M:%S')
+                st.markdown(f"**Time:** {timestamp}")
                 st.divider()
\ No newline at end of file
@@ -1,3 +1,4 @@
+import itertools
 import streamlit as st
 from config import MODEL_OPTIONS
 import traceback
@@ -10,38 +11,49 @@ from utils.tool_schema_parser import extract_tool_parameters
 from utils.async_helpers import reset_connection_state
 
 
+# Chats listed in the sidebar history per "Load more" page
+HISTORY_PAGE_SIZE = 50
+
+
+def _load_more_history():
+    st.session_state["sidebar_history_limit"] = (
+        st.session_state.get("sidebar_history_limit", HISTORY_PAGE_SIZE) + HISTORY_PAGE_SIZE
+    )
+
+
 def create_history_chat_container():
     history_container = st.sidebar.container(height=400, border=None)
     with history_container:
-        chat_history_menu = [
-                f"{chat['chat_name']}_::_{chat['chat_id']}"
-                for chat in st.session_state["history_chats"]
-            ]
-        chat_history_menu = chat_history_menu[:50][::-1]
+        history_chats = st.session_state["history_chats"]
+        chats_by_id = st.session_state["history_chats_by_id"]
+        limit = st.session_state.get("sidebar_history_limit", HISTORY_PAGE_SIZE)
+        # Newest first, only as many chats as the loaded pages cover; options are
+        # chat ids, names are looked up only for the rows being drawn
+        chat_history_menu = [chat['chat_id'] for chat in itertools.islice(reversed(history_chats), limit)]
         
         if chat_history_menu:
             current_chat = st.radio(
                 label="History Chats",
-                format_func=lambda x: x.split("_::_")[0] + '...' if "_::_" in x else x,
+                format_func=lambda chat_id: chats_by_id[chat_id]['chat_name'] + '...',
                 options=chat_history_menu,
                 label_visibility="collapsed",
-                index=st.session_state["current_chat_index"],
+                index=min(st.session_state["current_chat_index"], len(chat_history_menu) - 1),
                 key="current_chat"
             )
             
+            if len(history_chats) > limit:
+                st.button("Load more", key="history_load_more", on_click=_load_more_history)
+            
             if current_chat:
-                new_chat_id = current_chat.split("_::_")[1]
+                new_chat_id = current_chat
                 # Only update if chat actually changed
                 if st.session_state.get('current_chat_id') != new_chat_id:
                     logger = get_logger()
                     logger.log_system_status(f"Switching from chat {st.session_state.get('current_chat_id')} to {new_chat_id}")
                     
                     st.session_state['current_chat_id'] = new_chat_id
-                    # Update current chat index
-                    for i, chat in enumerate(st.session_state["history_chats"]):
-                        if chat['chat_id'] == new_chat_id:
-                            st.session_state["current_chat_index"] = i
-                            break
+                    # Update current chat index (position in the listed menu)
+                    st.session_state["current_chat_index"] = chat_history_menu.index(new_chat_id)
                     # Update messages to current chat
                     st.session_state["messages"] = get_current_chat(new_chat_id)
                     
@@ -53,7 +65,7 @@ def create_history_chat_container():
                         logger.log_system_status(f"Message {i}: role={msg.get('role')}, has_tool={has_tool}, has_content={has_content}")
                 
                 # Add download buttons for the selected chat
-                chat_id = current_chat.split("_::_")[1]
+                chat_id = current_chat
                 st.markdown("---")
                 st.markdown("**📥 Export Chat History:**")
                 
@@ -121,8 +133,8 @@ def create_provider_select_widget():
                 
                 if config_mode == "🔄 Default":
                     # Use environment variables - Force update params to ensure using environment variables
-                    from config import DEFAULT_ENV_CONFIG
-                    env_config = DEFAULT_ENV_CONFIG.get('Bedrock', {})
+                    from config import get_env_config
+                    env_config = get_env_config().get('Bedrock', {})
                     
                     # Force set to environment variable values to ensure passing to LLM
                     params['region_name'] = env_config.get('region_name', '')
@@ -177,8 +189,8 @@ def create_provider_select_widget():
                     horizontal=True
                 )
                 
-                from config import DEFAULT_ENV_CONFIG
-                env_config = DEFAULT_ENV_CONFIG.get(selected_provider, {})
+                from config import get_env_config
+                env_config = get_env_config().get(selected_provider, {})
                 
                 if config_mode == "🔄 Default":
                     # Use environment variables - Force update params to ensure using environment variables
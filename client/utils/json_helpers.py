@@ -0,0 +1,26 @@
+import json
+
+# Prefer orjson's C decoder when available, fall back to the stdlib otherwise.
+# orjson.JSONDecodeError subclasses json.JSONDecodeError, so callers can keep
+# catching json.JSONDecodeError either way.
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+
+def json_loads(data):
+    """Decode JSON from str or bytes."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def json_dumps(data, indent: bool = False) -> str:
+    """Encode *data* as a JSON str, keeping non-ASCII text; *indent* uses two spaces."""
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(data, option=option).decode('utf-8')
+    return json.dumps(data, indent=2 if indent else None, ensure_ascii=False)